@@ -1,4 +1,10 @@
+import os
+
 from pipeline.run import run_pipeline
+from pipeline.worker import run_worker
 
 if __name__ == "__main__":
-    run_pipeline()
+    if os.getenv("WORKER_MODE", "false").lower() == "true":
+        run_worker()
+    else:
+        run_pipeline()
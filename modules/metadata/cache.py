@@ -0,0 +1,47 @@
+import hashlib
+import json
+import os
+from typing import Dict, Optional
+
+from openai.types.chat import ChatCompletion
+
+from util import logger
+from util.disk_cache import DiskCache
+
+CACHE_DIR = os.getenv("LLM_CACHE_DIR", os.path.join("cache", "llm"))
+CACHE_MAX_BYTES = int(os.getenv("LLM_CACHE_MAX_MB", "256")) * 1024 * 1024
+CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", str(7 * 24 * 3600)))
+CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "true").lower() == "true"
+
+
+def request_key(request: Dict) -> str:
+    # Model, messages and sampling parameters all live in the request kwargs.
+    canonical = json.dumps(request, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class ChatCompletionCache:
+    def __init__(self, directory: str = CACHE_DIR, max_bytes: int = CACHE_MAX_BYTES, ttl: float = CACHE_TTL):
+        self._cache = DiskCache(directory, max_bytes, ttl=ttl)
+
+    def get(self, request: Dict) -> Optional[ChatCompletion]:
+        try:
+            data = self._cache.get(request_key(request))
+            if data is None:
+                return None
+            response = ChatCompletion.model_validate_json(data)
+        except Exception as e:
+            logger.warning(f"⚠️ Failed to read cached completion: {e}")
+            return None
+
+        logger.info(f"🗃️ LLM cache hit for {request.get('model')}")
+        return response
+
+    def put(self, request: Dict, response: ChatCompletion):
+        try:
+            self._cache.put(request_key(request), response.model_dump_json().encode("utf-8"))
+        except Exception as e:
+            logger.warning(f"⚠️ Failed to cache completion: {e}")
+
+
+completion_cache = ChatCompletionCache()
@@ -1,17 +1,44 @@
 import os
-import re
+import sys
 import json
+import math
 import random
-from typing import Dict, List
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
 from openai import OpenAI
 from openai.types.chat import ChatCompletionSystemMessageParam, ChatCompletionUserMessageParam
+from modules.metadata.json_stream import JsonFieldStream, repair_json_escapes
 from modules.metadata.retry import safe_chat_completion
+from modules.metadata.schema import METADATA_SCHEMA, METADATA_FIELDS, validate_field, validate_fields
+from modules.transcripts.compact import CompactTranscript, as_compact
+from modules.metadata.transcript_format import format_transcript, format_timestamp, count_tokens, \
+    TRANSCRIPT_TOKEN_BUDGET
 from pipeline import JobContext
+from util import logger
 
 client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
 
+SUMMARY_MAX_PARALLEL = int(os.getenv("SUMMARY_MAX_PARALLEL", "4"))
+SUMMARY_WINDOW_SECONDS = int(os.getenv("SUMMARY_WINDOW_SECONDS", "1200"))
+SUMMARY_MIN_SECTION_SECONDS = 300
+SECTION_TRANSCRIPT_TOKENS = int(os.getenv("SUMMARY_SECTION_TOKENS", "12000"))
+FIELD_REPAIR_MODEL = os.getenv("METADATA_REPAIR_MODEL", "gpt-4o-mini")
+FIELD_REPAIR_ATTEMPTS = int(os.getenv("METADATA_REPAIR_ATTEMPTS", "2"))
+CHAPTER_TITLE_MODEL = os.getenv("CHAPTER_TITLE_MODEL", "gpt-4o-mini")
+CHAPTER_EXCERPT_CHARS = 300
+CHAPTER_TITLES_SCHEMA = {
+    "name": "chapter_titles",
+    "strict": True,
+    "schema": {
+        "type": "object",
+        "properties": {"titles": {"type": "array", "items": {"type": "string"}}},
+        "required": ["titles"],
+        "additionalProperties": False,
+    },
+}
 
-def generate_metadata(ctx: JobContext) -> Dict:
+
+def generate_metadata(ctx: JobContext, on_field: Optional[Callable[[str, Any], None]] = None) -> Dict:
     mode = ctx.input.get("mode", "standard")
 
     game_title = ctx.input["game_title"]
@@ -36,9 +63,9 @@ def generate_metadata(ctx: JobContext) -> Dict:
         chapters = ctx.input.get("chapters", [])
         game_mode = ctx.input.get("game_mode", '')
 
+    # Tone is applied when writing the fields, so the summary is shared across tone-only reruns.
     summary_payload = {
         "game_title": game_title,
-        "tone": tone,
         "transcript": transcript,
         "tags": tags,
         "chapters": chapters,
@@ -56,53 +83,137 @@ def generate_metadata(ctx: JobContext) -> Dict:
     }
 
     summary = summarize(summary_payload)
-    metadata = generate_fields(summary, metadata_payload)
+    if on_field:
+        on_field("summary", summary.strip())
+    metadata = generate_fields(summary, metadata_payload, on_field)
     return finalize(metadata, summary)
 
 
-def summarize(payload) -> str:
-    messages: List[ChatCompletionSystemMessageParam | ChatCompletionUserMessageParam] = [
-        ChatCompletionSystemMessageParam(
-            role="system",
-            content=(
-                "You are a gaming content analyst summarizing a full video for metadata generation, title ideation, and viewer engagement. "
-                "Use all the provided context to extract meaningful, highlight-worthy moments from the video.\n\n"
-                "Prioritize:\n"
-                "- Emotional tone shifts (rage, hype, frustration, clutch moments)\n"
-                "- Meme-worthy moments (weird deaths, screams, trolling)\n"
-                "- Skillful or educational plays (flicks, clutches, rotations, strats)\n"
-                "- Specific in-game actions (e.g., recoil reset, map control, grenade lineups)\n"
-                "- Map names, gear/loadouts, character roles, or iconic callouts\n\n"
-                "**Instructions:**\n"
-                "- Write in plain text only — no bullet points, no Markdown formatting, no headings.\n"
-                "- Prioritize detail, but label moments clearly. For example:\n"
-                "  '[2:13] Player lands 1v3 clutch on Mirage using AK — smooth spray control and perfect crosshair placement.'\n"
-                "  '[4:42] Rage moment after whiffed AWP shot — teammate laughs in VC.'\n"
-                "- Write like you’re preparing a highlight timeline for a YouTube editor.\n"
-                "- Keep it engaging, but lean into practical/educational context when relevant.\n"
-                "- Final output should read like an annotated highlight log crossed with an entertaining play-by-play.\n"
-                "- Aim for 500–800 words max — don't fill it with fluff."
+SUMMARY_SYSTEM_PROMPT = (
+    "You are a gaming content analyst summarizing a full video for metadata generation, title ideation, and viewer engagement. "
+    "Use all the provided context to extract meaningful, highlight-worthy moments from the video.\n\n"
+    "Prioritize:\n"
+    "- Emotional tone shifts (rage, hype, frustration, clutch moments)\n"
+    "- Meme-worthy moments (weird deaths, screams, trolling)\n"
+    "- Skillful or educational plays (flicks, clutches, rotations, strats)\n"
+    "- Specific in-game actions (e.g., recoil reset, map control, grenade lineups)\n"
+    "- Map names, gear/loadouts, character roles, or iconic callouts\n\n"
+    "**Instructions:**\n"
+    "- Write in plain text only — no bullet points, no Markdown formatting, no headings.\n"
+    "- Prioritize detail, but label moments clearly. For example:\n"
+    "  '[2:13] Player lands 1v3 clutch on Mirage using AK — smooth spray control and perfect crosshair placement.'\n"
+    "  '[4:42] Rage moment after whiffed AWP shot — teammate laughs in VC.'\n"
+    "- Write like you’re preparing a highlight timeline for a YouTube editor.\n"
+    "- Keep it engaging, but lean into practical/educational context when relevant.\n"
+    "- Final output should read like an annotated highlight log crossed with an entertaining play-by-play.\n"
+    "- Aim for 500–800 words max — don't fill it with fluff."
+)
+
+SECTION_SYSTEM_PROMPT = (
+    "You are a gaming content analyst logging one section of a longer video. "
+    "List the highlight-worthy moments of this section only: emotional shifts, meme-worthy moments, skillful plays, "
+    "specific in-game actions, maps, gear and callouts.\n\n"
+    "- Plain text only, one moment per line, each starting with its [m:ss] or [h:mm:ss] timestamp from the transcript.\n"
+    "- Be specific and factual; don't add an intro or conclusion.\n"
+    "- At most 200 words."
+)
+
+
+def _video_context(payload) -> str:
+    return (
+            f"Game Title: {payload['game_title']}\n"
+            f"Game Mode: {payload['game_mode']}\n"
+            f"Channel Name: {payload['channel_name'] or 'N/A'}\n"
+            f"Tags: {', '.join(payload['tags']) if payload['tags'] else 'None'}\n"
+            f"Chapters:\n"
+            + (
+                    "\n".join(
+                        f"- {ch.get('title', 'Untitled')} [{ch.get('start_time', 0)}s → {ch.get('end_time', 0)}s]"
+                        for ch in (payload['chapters'] or [])
+                    ) or "No chapters provided."
             )
-        ),
-        ChatCompletionUserMessageParam(
-            role="user",
-            content=(
-                    f"Game Title: {payload['game_title']}\n"
-                    f"Game Mode: {payload['game_mode']}\n"
-                    f"Tone: {payload['tone']}\n"
-                    f"Channel Name: {payload['channel_name'] or 'N/A'}\n"
-                    f"Tags: {', '.join(payload['tags']) if payload['tags'] else 'None'}\n"
-                    f"Chapters:\n"
-                    + (
-                            "\n".join(
-                                f"- {ch.get('title', 'Untitled')} [{ch.get('start_time', 0)}s → {ch.get('end_time', 0)}s]"
-                                for ch in (payload['chapters'] or [])
-                            ) or "No chapters provided."
-                    )
-                    + "\n\n"
-                      f"Transcript:\n{payload['transcript']}"
+            + "\n\n"
+    )
+
+
+def summarize(payload) -> str:
+    transcript = payload['transcript']
+    full_transcript = format_transcript(transcript, max_tokens=sys.maxsize)
+
+    if count_tokens(full_transcript) > TRANSCRIPT_TOKEN_BUDGET:
+        return summarize_hierarchical(payload)
+
+    return _write_highlight_log(payload, f"Transcript:\n{full_transcript}")
+
+
+def summarize_hierarchical(payload) -> str:
+    transcript = as_compact(payload['transcript'])
+    if not isinstance(transcript, CompactTranscript):
+        # Text-only transcripts have no timings to split on.
+        return _write_highlight_log(payload, f"Transcript:\n{format_transcript(transcript)}")
+
+    duration = transcript.duration or (float(transcript.ends[-1]) if transcript.segment_count else 0)
+    sections = _section_ranges(payload['chapters'], duration)
+    context = _video_context(payload)
+
+    def summarize_section(section: Tuple[str, float, float]) -> str:
+        title, start, end = section
+        part = transcript.slice_time(start, end)
+        if not part.segment_count:
+            return ""
+
+        messages: List[ChatCompletionSystemMessageParam | ChatCompletionUserMessageParam] = [
+            ChatCompletionSystemMessageParam(role="system", content=SECTION_SYSTEM_PROMPT),
+            ChatCompletionUserMessageParam(
+                role="user",
+                content=(
+                        context
+                        + f"Section: {title} [{format_timestamp(start)} → {format_timestamp(min(end, part.ends[-1]))}]\n\n"
+                        + f"Transcript:\n{format_transcript(part, SECTION_TRANSCRIPT_TOKENS)}"
+                )
             )
+        ]
+        response = safe_chat_completion(
+            client,
+            model="gpt-4o",
+            messages=messages,
+            temperature=0.3,
+            max_tokens=400
         )
+        return response.choices[0].message.content.strip()
+
+    with ThreadPoolExecutor(max_workers=SUMMARY_MAX_PARALLEL) as pool:
+        section_logs = list(pool.map(summarize_section, sections))
+
+    combined = "\n\n".join(
+        f"{title} [{format_timestamp(start)}]:\n{log}"
+        for (title, start, _), log in zip(sections, section_logs) if log
+    )
+    return _write_highlight_log(payload, f"Section highlight logs, in order:\n{combined}")
+
+
+def _section_ranges(chapters, duration: float) -> List[Tuple[str, float, float]]:
+    if chapters:
+        starts = []
+        for i, ch in enumerate(chapters):
+            start = ch.get("start_time", 0)
+            # Fold chapters that would leave the previous section too short into it.
+            if starts and start - starts[-1][1] < SUMMARY_MIN_SECTION_SECONDS:
+                continue
+            starts.append((ch.get("title") or f"Chapter {i + 1}", start))
+        starts[0] = (starts[0][0], 0)
+    else:
+        count = max(1, math.ceil(duration / SUMMARY_WINDOW_SECONDS))
+        starts = [(f"Part {i + 1}", i * SUMMARY_WINDOW_SECONDS) for i in range(count)]
+
+    ends = [start for _, start in starts[1:]] + [float("inf")]
+    return [(title, start, end) for (title, start), end in zip(starts, ends)]
+
+
+def _write_highlight_log(payload, source_material: str) -> str:
+    messages: List[ChatCompletionSystemMessageParam | ChatCompletionUserMessageParam] = [
+        ChatCompletionSystemMessageParam(role="system", content=SUMMARY_SYSTEM_PROMPT),
+        ChatCompletionUserMessageParam(role="user", content=_video_context(payload) + source_material)
     ]
 
     response = safe_chat_completion(
@@ -116,7 +227,7 @@ def summarize(payload) -> str:
     return response.choices[0].message.content.strip()
 
 
-def generate_fields(summary: str, payload) -> Dict:
+def generate_fields(summary: str, payload, on_field: Optional[Callable[[str, Any], None]] = None) -> Dict:
     messages: List[ChatCompletionSystemMessageParam | ChatCompletionUserMessageParam] = [
         ChatCompletionSystemMessageParam(
             role="system",
@@ -144,13 +255,7 @@ def generate_fields(summary: str, payload) -> Dict:
                 - It should make people want to click to find out what happened
                 
                 RETURN FORMAT:
-                Strictly return valid **RFC8259-compliant JSON** with the following fields:
-                - "title": string
-                - "description": string
-                - "overlay_text": string
-                
-                DO NOT include markdown, comments, or explanations — only valid JSON.
-                CRITICAL: All double quotes inside values must be escaped like \", and strings must use double quotes around keys and values.
+                Return the "title", "overlay_text" and "description" fields, in this order.
                 """
             )
         ),
@@ -169,29 +274,166 @@ def generate_fields(summary: str, payload) -> Dict:
         )
     ]
 
-    response = safe_chat_completion(
+    stream = safe_chat_completion(
         client,
         model="gpt-4o",
         messages=messages,
         temperature=random.uniform(0.6, 0.85),
-        max_tokens=1000
+        max_tokens=1000,
+        response_format={"type": "json_schema", "json_schema": METADATA_SCHEMA},
+        stream=True,
+        cache=False
     )
 
-    raw_content = response.choices[0].message.content.strip()
-    raw_content = re.sub(r"^```(?:json)?\s*", "", raw_content)
-    raw_content = re.sub(r"\s*```$", "", raw_content)
-    raw_content = raw_content.replace("\\'", "'").replace('\r', '')
-    raw_content = re.sub(r'\\([^"\\/bfnrtu])', r'\\\\\1', raw_content)
+    # Title and overlay text come first in the schema, so they can be handed out while the
+    # description is still being generated. Only values that pass validation are handed out,
+    # since anything else may still change in a repair.
+    parser = JsonFieldStream()
+    chunks = []
+    handed_out = set()
+    for chunk in stream:
+        if not chunk.choices:
+            continue
+        delta = chunk.choices[0].delta
+        if getattr(delta, "refusal", None):
+            raise RuntimeError(f"Metadata generation was refused: {delta.refusal}")
+        if not delta.content:
+            continue
+        chunks.append(delta.content)
+        for key, value in parser.feed(delta.content):
+            if on_field and validate_field(key, value) is None:
+                on_field(key, value.strip())
+                handed_out.add(key)
+
+    fields = parser.fields if parser.done else _parse_partial("".join(chunks))
+    errors = validate_fields(fields)
+
+    for attempt in range(FIELD_REPAIR_ATTEMPTS):
+        if not errors:
+            break
+        logger.warning(f"⚠️ Metadata fields invalid ({'; '.join(errors)}). Repairing (attempt {attempt + 1})")
+        fields = repair_fields(fields, errors, payload, summary)
+        errors = validate_fields(fields)
 
-    if not raw_content.startswith("{"):
-        raise RuntimeError(f"Expected JSON, got:\n{raw_content[:300]}")
+    if errors:
+        # Missing fields can't be used, but a slightly-off length is not worth failing the job over.
+        missing = [key for key in METADATA_FIELDS if not isinstance(fields.get(key), str) or not fields[key].strip()]
+        if missing:
+            raise RuntimeError(f"Metadata generation failed validation: {'; '.join(errors)}")
+        logger.warning(f"⚠️ Keeping metadata with minor issues: {'; '.join(errors)}")
 
+    if on_field:
+        for key in METADATA_FIELDS:
+            if key not in handed_out:
+                on_field(key, fields[key].strip())
+
+    return fields
+
+
+def _parse_partial(raw_content: str) -> Dict:
+    # A stream cut short (e.g. by max_tokens) still leaves its completed fields usable for repair.
+    parser = JsonFieldStream()
+    parser.feed(raw_content)
+    if parser.done:
+        return parser.fields
     try:
-        parsed = json.loads(raw_content)
-    except json.JSONDecodeError as e:
-        raise RuntimeError(f"Failed to parse JSON:\n{raw_content}\n\nError: {e}")
+        return json.loads(repair_json_escapes(raw_content.strip()))
+    except json.JSONDecodeError:
+        return parser.fields
 
-    return parsed
+
+def repair_fields(fields: Dict, errors: List[str], payload, summary: str) -> Dict:
+    # Fixes only what failed validation with a small model, reusing everything already generated.
+    # The summary is included so fields lost to a cut-off stream are rewritten from the video,
+    # not just from the other fields.
+    messages: List[ChatCompletionSystemMessageParam | ChatCompletionUserMessageParam] = [
+        ChatCompletionSystemMessageParam(
+            role="system",
+            content=(
+                "You fix YouTube metadata for a gaming video so it passes validation. "
+                "Keep valid fields exactly as they are. Rewrite only what the errors mention, "
+                "keeping the same language, tone and meaning. If a field is missing, write it "
+                "from the video summary, consistent with the other fields."
+            )
+        ),
+        ChatCompletionUserMessageParam(
+            role="user",
+            content=(
+                f"Game Title: {payload['game_title']}\n"
+                f"Tone: {payload['tone']}\n\n"
+                f"Video summary:\n{summary}\n\n"
+                f"Current fields:\n{json.dumps(fields, ensure_ascii=False, indent=2)}\n\n"
+                "Errors:\n" + "\n".join(f"- {error}" for error in errors)
+            )
+        )
+    ]
+
+    response = safe_chat_completion(
+        client,
+        model=FIELD_REPAIR_MODEL,
+        messages=messages,
+        temperature=0.2,
+        max_tokens=1500,
+        response_format={"type": "json_schema", "json_schema": METADATA_SCHEMA},
+        cache=False
+    )
+
+    message = response.choices[0].message
+    if getattr(message, "refusal", None) or not message.content:
+        return fields
+
+    # Valid fields may already have been handed out, so only invalid ones are replaced.
+    repaired = _parse_partial(message.content)
+    return {
+        key: repaired[key] if key in repaired and validate_field(key, fields.get(key)) else fields.get(key)
+        for key in METADATA_FIELDS
+    }
+
+
+def polish_chapter_titles(chapters: List[Dict], excerpts: List[str], game_title: str) -> List[Dict]:
+    # Rewrites only the titles of locally segmented chapters; boundaries are never changed and
+    # the term-based titles are kept if the response doesn't line up.
+    lines = "\n".join(
+        f"{i + 1}. [{format_timestamp(ch['start_time'])}] terms: {ch['title']} | "
+        f"excerpt: {excerpt[:CHAPTER_EXCERPT_CHARS]}"
+        for i, (ch, excerpt) in enumerate(zip(chapters, excerpts))
+    )
+    messages: List[ChatCompletionSystemMessageParam | ChatCompletionUserMessageParam] = [
+        ChatCompletionSystemMessageParam(
+            role="system",
+            content=(
+                "You name chapters of a gaming video on YouTube. For every chapter you get its key "
+                "terms and the start of its transcript. Return one short, specific title (2-6 words) "
+                "per chapter, in the same order. No numbering, timestamps or emojis."
+            )
+        ),
+        ChatCompletionUserMessageParam(
+            role="user",
+            content=f"Game Title: {game_title}\n\nChapters:\n{lines}"
+        )
+    ]
+
+    response = safe_chat_completion(
+        client,
+        model=CHAPTER_TITLE_MODEL,
+        messages=messages,
+        temperature=0.3,
+        max_tokens=30 * len(chapters) + 50,
+        response_format={"type": "json_schema", "json_schema": CHAPTER_TITLES_SCHEMA},
+    )
+
+    message = response.choices[0].message
+    if getattr(message, "refusal", None) or not message.content:
+        return chapters
+
+    titles = json.loads(message.content).get("titles") or []
+    if len(titles) != len(chapters):
+        logger.warning(f"⚠️ Got {len(titles)} chapter titles for {len(chapters)} chapters, keeping term titles")
+        return chapters
+    return [
+        {**ch, "title": title.strip()[:100] or ch["title"]}
+        for ch, title in zip(chapters, titles)
+    ]
 
 
 def finalize(metadata: Dict, summary: str) -> Dict:
@@ -0,0 +1,129 @@
+import json
+import re
+from typing import Any, Dict, List, Tuple
+
+INVALID_ESCAPE = re.compile(r'\\([^"\\/bfnrtu])')
+
+
+def repair_json_escapes(text: str) -> str:
+    text = text.replace("\\'", "'").replace('\r', '')
+    return INVALID_ESCAPE.sub(r'\\\\\1', text)
+
+
+def _decode(token: str) -> Any:
+    try:
+        return json.loads(token, strict=False)
+    except json.JSONDecodeError:
+        return json.loads(repair_json_escapes(token), strict=False)
+
+
+class JsonFieldStream:
+    # Incremental parser for a streamed top-level JSON object. Text can be fed in arbitrary chunks;
+    # feed() returns the (key, value) pairs whose values were completed by that chunk. Anything before
+    # the opening brace (e.g. a markdown fence) and after the closing one is ignored.
+
+    def __init__(self):
+        self.fields: Dict[str, Any] = {}
+        self.done = False
+        self._state = "start"
+        self._token: List[str] = []
+        self._key = None
+        self._escaped = False
+        self._in_string = False
+        self._depth = 0
+
+    def feed(self, text: str) -> List[Tuple[str, Any]]:
+        completed = []
+        for char in text:
+            if self.done:
+                break
+            field = self._step(char)
+            if field is not None:
+                completed.append(field)
+        return completed
+
+    def _step(self, char: str):
+        state = self._state
+
+        if state == "start":
+            if char == "{":
+                self._state = "key"
+        elif state == "key":
+            if char == '"':
+                self._state = "key_string"
+                self._token = ['"']
+            elif char == "}":
+                self.done = True
+        elif state == "key_string":
+            if self._string_char(char):
+                self._key = _decode("".join(self._token))
+                self._state = "colon"
+        elif state == "colon":
+            if char == ":":
+                self._state = "value"
+        elif state == "value":
+            if char == '"':
+                self._state = "string"
+                self._token = ['"']
+            elif not char.isspace():
+                self._state = "raw"
+                self._token = []
+                self._depth = 0
+                self._in_string = False
+                return self._raw_char(char)
+        elif state == "string":
+            if self._string_char(char):
+                self._state = "after"
+                return self._complete()
+        elif state == "raw":
+            return self._raw_char(char)
+        elif state == "after":
+            if char == ",":
+                self._state = "key"
+            elif char == "}":
+                self.done = True
+        return None
+
+    def _string_char(self, char: str) -> bool:
+        self._token.append(char)
+        if self._escaped:
+            self._escaped = False
+        elif char == "\\":
+            self._escaped = True
+        elif char == '"':
+            return True
+        return False
+
+    def _raw_char(self, char: str):
+        # Numbers, literals and nested values end at the first top-level comma or closing brace.
+        if self._in_string:
+            if self._escaped:
+                self._escaped = False
+            elif char == "\\":
+                self._escaped = True
+            elif char == '"':
+                self._in_string = False
+        elif char == '"':
+            self._in_string = True
+        elif char in "[{":
+            self._depth += 1
+        elif char in "]}" and self._depth > 0:
+            self._depth -= 1
+        elif char in ",}" and self._depth == 0:
+            field = self._complete()
+            if char == ",":
+                self._state = "key"
+            else:
+                self.done = True
+            return field
+
+        self._token.append(char)
+        return None
+
+    def _complete(self) -> Tuple[str, Any]:
+        value = _decode("".join(self._token).strip())
+        self.fields[self._key] = value
+        self._token = []
+        if self._state == "raw":
+            self._state = "after"
+        return self._key, value
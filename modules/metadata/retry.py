@@ -1,23 +1,45 @@
-import time
-import random
 from openai import OpenAI
-from util import logger
-
-def safe_chat_completion(client: OpenAI, **kwargs):
-    max_retries = 5
-    for attempt in range(max_retries):
-        try:
-            return client.chat.completions.create(**kwargs)
-        except Exception as e:
-            is_rate_limit = hasattr(e, "status_code") and e.status_code == 429
-            base_wait = 10 * (2 ** max(attempt - 1, 0))
-            wait_time = min(base_wait + random.uniform(0, 1), 120)
-
-            if is_rate_limit:
-                logger.warning(f"[429] Rate limited. Retrying in {wait_time:.2f}s (attempt {attempt + 1}/{max_retries})")
-                time.sleep(wait_time)
-            else:
-                logger.error(f"OpenAI call failed: {e}")
-                raise
-
-    raise RuntimeError("Max retries exceeded for OpenAI call")
+from modules.metadata.cache import completion_cache, CACHE_ENABLED
+from modules.metadata.scheduler import openai_scheduler, CALL_DEADLINE
+
+
+def _estimate_chat_tokens(kwargs) -> int:
+    # Mirrors how OpenAI charges rate-limit tokens up front: ~4 characters per prompt token plus
+    # the completion allowance. The difference is refunded from the response usage.
+    prompt_chars = sum(len(str(message.get("content") or "")) for message in kwargs.get("messages", []))
+    return prompt_chars // 4 + (kwargs.get("max_tokens") or 0)
+
+
+def _usage_tokens(response):
+    usage = getattr(response, "usage", None)
+    return usage.total_tokens if usage else None
+
+
+def safe_chat_completion(client: OpenAI, cache: bool = True, deadline: float = CALL_DEADLINE, **kwargs):
+    use_cache = cache and CACHE_ENABLED and not kwargs.get("stream")
+    if use_cache:
+        cached = completion_cache.get(kwargs)
+        if cached is not None:
+            return cached
+
+    response = openai_scheduler.call(
+        lambda timeout: client.with_options(max_retries=0, timeout=timeout)
+        .chat.completions.with_raw_response.create(**kwargs),
+        model=kwargs["model"],
+        estimated_tokens=_estimate_chat_tokens(kwargs),
+        deadline=deadline,
+        usage_tokens=_usage_tokens,
+    )
+
+    if use_cache:
+        completion_cache.put(kwargs, response)
+    return response
+
+
+def safe_image_generation(client: OpenAI, deadline: float = CALL_DEADLINE, **kwargs):
+    return openai_scheduler.call(
+        lambda timeout: client.with_options(max_retries=0, timeout=timeout)
+        .images.with_raw_response.generate(**kwargs),
+        model=kwargs["model"],
+        deadline=deadline,
+    )
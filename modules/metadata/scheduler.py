@@ -0,0 +1,208 @@
+import os
+import random
+import re
+import threading
+import time
+from typing import Callable, Dict, Optional, Tuple
+
+import openai
+
+from util import logger
+
+DEFAULT_RPM = float(os.getenv("OPENAI_DEFAULT_RPM", "500"))
+DEFAULT_TPM = float(os.getenv("OPENAI_DEFAULT_TPM", "300000"))
+MAX_CONCURRENT_REQUESTS = int(os.getenv("OPENAI_MAX_CONCURRENCY", "4"))
+CALL_DEADLINE = float(os.getenv("OPENAI_CALL_DEADLINE", "300"))
+REQUEST_TIMEOUT = float(os.getenv("OPENAI_REQUEST_TIMEOUT", "120"))
+MAX_ATTEMPTS = int(os.getenv("OPENAI_MAX_ATTEMPTS", "6"))
+BACKOFF_BASE = 1.0
+BACKOFF_CAP = 30.0
+
+DURATION_PART = re.compile(r"([\d.]+)(ms|s|m|h)")
+DURATION_UNITS = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+
+
+def parse_duration(value: Optional[str]) -> Optional[float]:
+    # OpenAI reset headers look like "1s", "6m0s" or "20ms".
+    if not value:
+        return None
+    parts = DURATION_PART.findall(value)
+    if not parts:
+        return None
+    return sum(float(amount) * DURATION_UNITS[unit] for amount, unit in parts)
+
+
+def retry_after_seconds(headers) -> Optional[float]:
+    if not headers:
+        return None
+    for name, scale in (("retry-after-ms", 0.001), ("retry-after", 1)):
+        value = headers.get(name)
+        if value:
+            try:
+                return float(value) * scale
+            except ValueError:
+                continue
+    return None
+
+
+class DeadlineExceeded(RuntimeError):
+    pass
+
+
+class TokenBucket:
+    def __init__(self, per_minute: float):
+        self.capacity = per_minute
+        self.rate = per_minute / 60
+        self.tokens = per_minute
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        self._refill(now)
+        if now < self.blocked_until:
+            return self.blocked_until - now
+        # Requests bigger than the whole bucket are let through once it is full.
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate
+
+    def take(self, amount: float):
+        self.tokens -= amount
+
+    def refund(self, amount: float):
+        self.tokens = min(self.capacity, self.tokens + amount)
+
+    def observe(self, limit: Optional[float], remaining: Optional[float]):
+        now = time.monotonic()
+        self._refill(now)
+        if limit:
+            self.capacity = limit
+            self.rate = limit / 60
+        if remaining is not None:
+            self.tokens = min(self.tokens, remaining)
+
+    def block_for(self, seconds: float):
+        self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+
+
+def _header_float(headers, name: str) -> Optional[float]:
+    try:
+        return float(headers.get(name))
+    except (TypeError, ValueError):
+        return None
+
+
+class RequestScheduler:
+    # One policy for every OpenAI call in the process: per-model request and token buckets kept in
+    # sync with the x-ratelimit-* headers, a cap on in-flight requests, Retry-After aware jittered
+    # backoff on retryable errors, and an overall deadline per call.
+
+    def __init__(self, max_concurrent: int = MAX_CONCURRENT_REQUESTS):
+        self._lock = threading.Condition()
+        self._buckets: Dict[str, Tuple[TokenBucket, TokenBucket]] = {}
+        self._slots = threading.BoundedSemaphore(max_concurrent)
+
+    def call(self, send: Callable[[float], object], model: str, estimated_tokens: int = 0,
+             deadline: float = CALL_DEADLINE, usage_tokens: Optional[Callable[[object], Optional[int]]] = None):
+        expires_at = time.monotonic() + deadline
+
+        for attempt in range(MAX_ATTEMPTS):
+            self._reserve(model, estimated_tokens, expires_at)
+            remaining = expires_at - time.monotonic()
+            try:
+                with self._slots:
+                    raw = send(min(REQUEST_TIMEOUT, max(remaining, 1)))
+            except Exception as e:
+                wait_time = self._on_error(model, e, attempt)
+                if wait_time is None or attempt + 1 == MAX_ATTEMPTS:
+                    logger.error(f"OpenAI call failed: {e}")
+                    raise
+                if time.monotonic() + wait_time > expires_at:
+                    raise DeadlineExceeded(f"OpenAI call to {model} exceeded its {deadline:.0f}s deadline: {e}") from e
+                logger.warning(f"OpenAI call failed ({e}). Retrying in {wait_time:.2f}s "
+                               f"(attempt {attempt + 1}/{MAX_ATTEMPTS})")
+                time.sleep(wait_time)
+                continue
+
+            self._observe(model, raw.headers)
+            result = raw.parse()
+            if usage_tokens and estimated_tokens:
+                used = usage_tokens(result)
+                if used is not None:
+                    with self._lock:
+                        self._bucket_pair(model)[1].refund(estimated_tokens - used)
+                        self._lock.notify_all()
+            return result
+
+        raise RuntimeError("Max retries exceeded for OpenAI call")
+
+    def _bucket_pair(self, model: str) -> Tuple[TokenBucket, TokenBucket]:
+        pair = self._buckets.get(model)
+        if pair is None:
+            pair = self._buckets[model] = (TokenBucket(DEFAULT_RPM), TokenBucket(DEFAULT_TPM))
+        return pair
+
+    def _reserve(self, model: str, tokens: int, expires_at: float):
+        with self._lock:
+            requests_bucket, tokens_bucket = self._bucket_pair(model)
+            while True:
+                now = time.monotonic()
+                wait_time = max(requests_bucket.wait_time(1, now), tokens_bucket.wait_time(tokens, now))
+                if wait_time <= 0:
+                    requests_bucket.take(1)
+                    tokens_bucket.take(tokens)
+                    return
+                if now + wait_time > expires_at:
+                    raise DeadlineExceeded(f"OpenAI rate limit for {model} would exceed the call deadline")
+                self._lock.wait(wait_time)
+
+    def _observe(self, model: str, headers):
+        with self._lock:
+            requests_bucket, tokens_bucket = self._bucket_pair(model)
+            requests_bucket.observe(_header_float(headers, "x-ratelimit-limit-requests"),
+                                    _header_float(headers, "x-ratelimit-remaining-requests"))
+            tokens_bucket.observe(_header_float(headers, "x-ratelimit-limit-tokens"),
+                                  _header_float(headers, "x-ratelimit-remaining-tokens"))
+
+    def _on_error(self, model: str, e: Exception, attempt: int) -> Optional[float]:
+        if isinstance(e, (openai.APIConnectionError, openai.APITimeoutError)):
+            return random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt))
+
+        if not isinstance(e, openai.APIStatusError):
+            return None
+
+        status = e.status_code
+        if status == 429 and getattr(e, "code", None) == "insufficient_quota":
+            return None
+        if status not in (408, 409, 429) and status < 500:
+            return None
+
+        headers = e.response.headers if e.response is not None else None
+        backoff = random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt))
+        retry_after = retry_after_seconds(headers)
+
+        if status == 429:
+            if headers is not None:
+                self._observe(model, headers)
+            reset = retry_after
+            if reset is None and headers is not None:
+                reset = max(parse_duration(headers.get("x-ratelimit-reset-requests")) or 0,
+                            parse_duration(headers.get("x-ratelimit-reset-tokens")) or 0) or None
+            if reset is not None:
+                # Hold every caller of this model back, not just this one.
+                with self._lock:
+                    for bucket in self._bucket_pair(model):
+                        bucket.block_for(reset)
+                return reset + random.uniform(0, 0.25 * reset + 0.1)
+
+        if retry_after is not None:
+            return retry_after + random.uniform(0, 0.1)
+        return backoff
+
+
+openai_scheduler = RequestScheduler()
@@ -0,0 +1,67 @@
+import re
+from typing import Any, Dict, List, Optional
+
+TITLE_MAX_CHARS = 100
+DESCRIPTION_MAX_CHARS = 5000
+OVERLAY_MIN_CHARS = 10
+OVERLAY_MAX_CHARS = 20
+OVERLAY_DISALLOWED = re.compile(r"[^\w\s!?]")
+
+# Field order matters: the stream is parsed incrementally and title/overlay_text are used before
+# the description is finished. Length limits aren't enforceable by strict mode, so they are also
+# checked in validate_field.
+METADATA_SCHEMA = {
+    "name": "youtube_metadata",
+    "strict": True,
+    "schema": {
+        "type": "object",
+        "properties": {
+            "title": {
+                "type": "string",
+                "description": f"Video title, at most {TITLE_MAX_CHARS} characters.",
+            },
+            "overlay_text": {
+                "type": "string",
+                "description": f"Thumbnail overlay text, {OVERLAY_MIN_CHARS}-{OVERLAY_MAX_CHARS} characters, "
+                               f"no punctuation other than ! and ?.",
+            },
+            "description": {
+                "type": "string",
+                "description": f"Video description, at most {DESCRIPTION_MAX_CHARS} characters.",
+            },
+        },
+        "required": ["title", "overlay_text", "description"],
+        "additionalProperties": False,
+    },
+}
+
+METADATA_FIELDS = tuple(METADATA_SCHEMA["schema"]["required"])
+
+
+def validate_field(key: str, value: Any) -> Optional[str]:
+    if not isinstance(value, str) or not value.strip():
+        return f"{key} must be a non-empty string"
+
+    value = value.strip()
+    if key == "title" and len(value) > TITLE_MAX_CHARS:
+        return f"title is {len(value)} characters, the limit is {TITLE_MAX_CHARS}"
+    if key == "description" and len(value) > DESCRIPTION_MAX_CHARS:
+        return f"description is {len(value)} characters, the limit is {DESCRIPTION_MAX_CHARS}"
+    if key == "overlay_text":
+        if not OVERLAY_MIN_CHARS <= len(value) <= OVERLAY_MAX_CHARS:
+            return f"overlay_text is {len(value)} characters, it must be {OVERLAY_MIN_CHARS}-{OVERLAY_MAX_CHARS}"
+        if OVERLAY_DISALLOWED.search(value):
+            return "overlay_text may only use letters, digits, spaces, ! and ?"
+    return None
+
+
+def validate_fields(fields: Dict[str, Any]) -> List[str]:
+    errors = []
+    for key in METADATA_FIELDS:
+        if key not in fields:
+            errors.append(f"{key} is missing")
+            continue
+        error = validate_field(key, fields[key])
+        if error:
+            errors.append(error)
+    return errors
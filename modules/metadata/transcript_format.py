@@ -0,0 +1,110 @@
+import math
+import os
+import re
+from collections import Counter
+from functools import lru_cache
+from typing import List, Optional, Tuple
+
+import tiktoken
+
+from pipeline.context import Transcript
+
+TRANSCRIPT_TOKEN_BUDGET = int(os.getenv("SUMMARY_TRANSCRIPT_TOKENS", "30000"))
+WINDOW_MAX_SECONDS = 30
+WINDOW_MAX_CHARS = 300
+
+SENTENCE_END = re.compile(r"[.!?…][\"')\]]*$")
+WORD = re.compile(r"[a-z0-9']+")
+
+
+@lru_cache(maxsize=None)
+def _encoding(model: str) -> tiktoken.Encoding:
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("o200k_base")
+
+
+def count_tokens(text: str, model: str = "gpt-4o") -> int:
+    return len(_encoding(model).encode(text, disallowed_special=()))
+
+
+def format_timestamp(seconds: float) -> str:
+    seconds = int(seconds)
+    hours, rest = divmod(seconds, 3600)
+    minutes, secs = divmod(rest, 60)
+    return f"{hours}:{minutes:02d}:{secs:02d}" if hours else f"{minutes}:{secs:02d}"
+
+
+def merge_windows(segments) -> List[Tuple[float, str]]:
+    windows = []
+    start = None
+    parts = []
+    chars = 0
+
+    for seg in segments:
+        text = seg["text"].strip()
+        if not text:
+            continue
+        if start is None:
+            start = seg["start"]
+        parts.append(text)
+        chars += len(text) + 1
+
+        if SENTENCE_END.search(text) or chars >= WINDOW_MAX_CHARS or seg["end"] - start >= WINDOW_MAX_SECONDS:
+            windows.append((start, " ".join(parts)))
+            start, parts, chars = None, [], 0
+
+    if parts:
+        windows.append((start, " ".join(parts)))
+    return windows
+
+
+def _information_density(lines: List[str], token_counts: List[int]) -> List[float]:
+    # Sum of IDF over a window's distinct words, per token spent on it. Repetitive filler
+    # ("yeah yeah lol") and words that appear everywhere score low.
+    words = [set(WORD.findall(line.lower())) for line in lines]
+    doc_freq = Counter(word for window in words for word in window)
+    n = len(lines)
+    return [
+        sum(math.log(n / doc_freq[word]) for word in window) / max(tokens, 1)
+        for window, tokens in zip(words, token_counts)
+    ]
+
+
+def format_transcript(transcript: Optional[Transcript], max_tokens: int = TRANSCRIPT_TOKEN_BUDGET,
+                      model: str = "gpt-4o") -> str:
+    if not transcript:
+        return ""
+
+    encoding = _encoding(model)
+    segments = transcript.get("segments") or []
+    if not segments:
+        tokens = encoding.encode(transcript.get("text") or "", disallowed_special=())
+        return encoding.decode(tokens[:max_tokens])
+
+    lines = [f"[{format_timestamp(start)}] {text}" for start, text in merge_windows(segments)]
+    token_counts = [len(tokens) + 1 for tokens in encoding.encode_batch(lines, disallowed_special=())]
+
+    total = sum(token_counts)
+    if total <= max_tokens:
+        return "\n".join(lines)
+
+    keep = [True] * len(lines)
+    density = _information_density(lines, token_counts)
+    drop_order = sorted(range(len(lines)), key=lambda i: density[i])
+
+    # Every kept line carries its own timestamp, so dropped spans need no marker. Per-line
+    # counts are additive up to a token or so at line joins; confirm with an exact count.
+    cursor = 0
+    while True:
+        while total > max_tokens and cursor < len(drop_order):
+            i = drop_order[cursor]
+            keep[i] = False
+            total -= token_counts[i]
+            cursor += 1
+
+        rendered = "\n".join(line for line, kept in zip(lines, keep) if kept)
+        total = len(encoding.encode(rendered, disallowed_special=()))
+        if total <= max_tokens or cursor >= len(drop_order):
+            return rendered
@@ -1,15 +1,32 @@
+import io
 import os
 import re
+from functools import lru_cache
 
 from typing import List
 from openai import OpenAI
 from openai.types.chat import ChatCompletionSystemMessageParam, ChatCompletionUserMessageParam
 from PIL import Image, ImageDraw, ImageFont
-from modules.metadata.retry import safe_chat_completion
+from modules.metadata.retry import safe_chat_completion, safe_image_generation
 from pipeline import JobContext
 
 client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
 
+THUMBNAIL_SIZE = (1280, 720)
+# Pillow format name -> (file extension, content type); uploaded and saved files follow THUMBNAIL_FORMAT.
+THUMBNAIL_FORMATS = {
+    "JPEG": ("jpg", "image/jpeg"),
+    "PNG": ("png", "image/png"),
+    "WEBP": ("webp", "image/webp"),
+}
+THUMBNAIL_FORMAT = os.getenv("THUMBNAIL_FORMAT", "JPEG").upper()
+THUMBNAIL_FORMAT = {"JPG": "JPEG"}.get(THUMBNAIL_FORMAT, THUMBNAIL_FORMAT)
+if THUMBNAIL_FORMAT not in THUMBNAIL_FORMATS:
+    raise ValueError(f"THUMBNAIL_FORMAT must be one of {', '.join(THUMBNAIL_FORMATS)}, got '{THUMBNAIL_FORMAT}'")
+THUMBNAIL_EXTENSION, THUMBNAIL_CONTENT_TYPE = THUMBNAIL_FORMATS[THUMBNAIL_FORMAT]
+THUMBNAIL_QUALITY = int(os.getenv("THUMBNAIL_QUALITY", "75"))
+FONT_PATH = os.path.join("assets", "impacted.ttf")
+
 
 def generate_thumbnail_prompt(ctx: JobContext) -> str:
     game_title = ctx.input.get("game_title")
@@ -55,7 +72,8 @@ def generate_thumbnail_prompt(ctx: JobContext) -> str:
 
 
 def generate_thumbnail_image(prompt: str) -> str:
-    response = client.images.generate(
+    response = safe_image_generation(
+        client,
         prompt=prompt,
         model="dall-e-3",
         size="1792x1024",
@@ -64,60 +82,73 @@ def generate_thumbnail_image(prompt: str) -> str:
     )
     return response.data[0].url
 
-def resize_image_for_youtube(image_path: str):
-    image = Image.open(image_path).convert("RGB")
-    image = image.resize((1280, 720), Image.Resampling.LANCZOS)
-    image.save(image_path)
+def decode_thumbnail(data: bytes) -> Image.Image:
+    # Decoded and scaled to YouTube size once; both the raw and the captioned thumbnail start here.
+    image = Image.open(io.BytesIO(data))
+    image.draft("RGB", THUMBNAIL_SIZE)
+    return image.convert("RGB").resize(THUMBNAIL_SIZE, Image.Resampling.LANCZOS)
+
 
+def encode_image(image: Image.Image, image_format: str = THUMBNAIL_FORMAT) -> bytes:
+    buffer = io.BytesIO()
+    image.save(buffer, format=image_format, quality=THUMBNAIL_QUALITY)
+    return buffer.getvalue()
 
-def add_text_top_center(image_path: str, text: str, output_path: str):
-    image = Image.open(image_path).convert("RGB")
-    image = image.resize((1280, 720), Image.Resampling.LANCZOS)
+
+@lru_cache(maxsize=8)
+def load_font(size: int):
+    try:
+        return ImageFont.truetype(FONT_PATH, size=size)
+    except IOError:
+        return ImageFont.load_default()
+
+
+def _wrap_lines(font, words: List[str], max_width: float) -> List[str]:
+    # Each word is measured once; line widths are sums of word and space advances.
+    space = font.getlength(" ")
+    lines: List[str] = []
+    current: List[str] = []
+    width = 0.0
+
+    for word in words:
+        word_width = font.getlength(word)
+        line_width = width + space + word_width if current else word_width
+        if line_width <= max_width or not current:
+            current.append(word)
+            width = line_width
+        else:
+            lines.append(" ".join(current))
+            current, width = [word], word_width
+    if current:
+        lines.append(" ".join(current))
+    return lines
+
+
+def add_text_top_center(image: Image.Image, text: str) -> Image.Image:
+    image = image.copy()
     draw = ImageDraw.Draw(image)
 
-    # Load Impact from assets folder
-    font_path = os.path.join("assets", "impacted.ttf")
     font_size = 175
     side_margin = 60
     line_spacing = 20
 
     max_width_ratio = 0.4
 
-    try:
-        font = ImageFont.truetype(font_path, size=font_size)
-    except IOError:
-        font = ImageFont.load_default()
+    font = load_font(font_size)
 
     image_width, image_height = image.size
-    max_line_width = image_width * max_width_ratio
-    text = text.upper()
-
-    # Manual word wrapping
-    words = text.split()
-    lines = []
-    current_line = ""
-
-    for word in words:
-        test_line = f"{current_line} {word}".strip()
-        line_width = font.getbbox(test_line)[2] - font.getbbox(test_line)[0]
-        if line_width <= max_line_width:
-            current_line = test_line
-        else:
-            lines.append(current_line)
-            current_line = word
-    if current_line:
-        lines.append(current_line)
+    lines = _wrap_lines(font, text.upper().split(), image_width * max_width_ratio)
 
     if len(lines) > 3:
         lines = lines[:3]
         lines[-1] += "..."
 
     # Calculate Y position
-    total_height = sum(font.getbbox(line)[3] - font.getbbox(line)[1] for line in lines) + (
-            len(lines) - 1) * line_spacing
+    heights = [_line_height(font, line) for line in lines]
+    total_height = sum(heights) + (len(lines) - 1) * line_spacing
     current_y = (image_height - total_height) // 2
 
-    for line in lines:
+    for line, height in zip(lines, heights):
         draw.text(
             (side_margin, current_y),
             line,
@@ -126,6 +157,11 @@ def add_text_top_center(image_path: str, text: str, output_path: str):
             stroke_width=10,
             stroke_fill="black"
         )
-        current_y += font.getbbox(line)[3] - font.getbbox(line)[1] + line_spacing
+        current_y += height + line_spacing
+
+    return image
+
 
-    image.save(output_path)
+def _line_height(font, line: str) -> int:
+    _, top, _, bottom = font.getbbox(line)
+    return bottom - top
@@ -0,0 +1,88 @@
+import gzip
+import hashlib
+import json
+import os
+from collections import Counter
+from typing import Optional
+
+from modules.transcripts.compact import CompactTranscript, as_compact
+from modules.transcripts.fingerprint import AudioFingerprint, MIN_MATCHING_LANDMARKS
+from pipeline.context import Transcript
+from util import logger
+from util.disk_cache import DiskCache
+
+CACHE_DIR = os.getenv("TRANSCRIPT_CACHE_DIR", os.path.join("cache", "transcripts"))
+CACHE_MAX_BYTES = int(os.getenv("TRANSCRIPT_CACHE_MAX_MB", "2048")) * 1024 * 1024
+
+
+def _alias_key(kind: str, value: str) -> str:
+    return hashlib.sha1(f"{kind}:{value}".encode("utf-8")).hexdigest()
+
+
+class TranscriptCache:
+    # Transcripts are stored once under their content hash; video IDs and audio fingerprint
+    # landmarks are small alias entries pointing at that content.
+
+    def __init__(self, directory: str = CACHE_DIR, max_bytes: int = CACHE_MAX_BYTES):
+        self._cache = DiskCache(directory, max_bytes)
+
+    def get_by_video(self, video_id: Optional[str]) -> Optional[Transcript]:
+        if not video_id:
+            return None
+        return self._load(self._content_key("video", video_id), f"video: {video_id}")
+
+    def get_by_fingerprint(self, fingerprint: Optional[AudioFingerprint]) -> Optional[Transcript]:
+        # Each landmark votes for the transcript its alias points at; enough shared landmarks
+        # means the same recording, even when shifted or trimmed.
+        if not fingerprint:
+            return None
+        votes = Counter(filter(None, (self._content_key("audio", key) for key in fingerprint.lookup_keys())))
+        if not votes:
+            return None
+        content_key, matches = votes.most_common(1)[0]
+        if matches < MIN_MATCHING_LANDMARKS:
+            return None
+        return self._load(content_key, f"audio ({matches} matching landmarks)")
+
+    def put(self, transcript: Transcript, video_id: Optional[str] = None,
+            fingerprint: Optional[AudioFingerprint] = None):
+        try:
+            compact = as_compact(transcript)
+            columns = compact.to_columns() if isinstance(compact, CompactTranscript) else compact
+            data = gzip.compress(json.dumps(columns).encode("utf-8"))
+            content_key = hashlib.sha256(data).hexdigest()
+            self._cache.put(content_key, data)
+            if video_id:
+                self._cache.put(_alias_key("video", video_id), content_key.encode("ascii"))
+            if fingerprint:
+                self._cache.put_many({
+                    _alias_key("audio", key): content_key.encode("ascii") for key in fingerprint.stored_keys()
+                })
+        except Exception as e:
+            logger.warning(f"⚠️ Failed to cache transcript: {e}")
+
+    def _content_key(self, kind: str, value: str) -> Optional[str]:
+        try:
+            content_key = self._cache.get(_alias_key(kind, value))
+        except Exception as e:
+            logger.warning(f"⚠️ Failed to read transcript cache alias: {e}")
+            return None
+        return content_key.decode("ascii") if content_key else None
+
+    def _load(self, content_key: Optional[str], hit: str) -> Optional[Transcript]:
+        if not content_key:
+            return None
+        try:
+            data = self._cache.get(content_key)
+            if not data:
+                return None
+            transcript = as_compact(json.loads(gzip.decompress(data)))
+        except Exception as e:
+            logger.warning(f"⚠️ Failed to read cached transcript: {e}")
+            return None
+
+        logger.info(f"🗃️ Transcript cache hit by {hit}")
+        return transcript
+
+
+transcript_cache = TranscriptCache()
@@ -0,0 +1,148 @@
+import math
+import os
+import re
+from collections import Counter
+from typing import Dict, List
+
+import numpy as np
+
+from modules.transcripts.compact import CompactTranscript
+from pipeline.context import Chapter
+
+BLOCK_SECONDS = 30
+COMPARE_BLOCKS = 4
+MIN_CHAPTER_SECONDS = int(os.getenv("FALLBACK_CHAPTER_MIN_SECONDS", "180"))
+MIN_CHAPTERS = 3
+MAX_CHAPTERS = int(os.getenv("FALLBACK_CHAPTER_MAX", "30"))
+TITLE_TERMS = 3
+
+WORD = re.compile(r"[a-z0-9][a-z0-9']{2,}")
+STOPWORDS = frozenset("""
+about after again all also and any are back because been before being but can come could did didn't does
+doesn't doing don't down even every for from get gets getting give going gonna got gotta had has have having
+here him his how i'll i'm i've into it's its just know let let's like look lot make many maybe more much need
+not now off okay one only other our out over pretty really right said say see she should some something still
+such sure take than thank thanks that that's the their them then there there's these they they're thing things
+think this those through too want was way we're well went were what what's when where which while who why will
+with would yeah yes you you're your yeah yep nah wanna kinda literally actually guys guy
+""".split())
+
+
+def _blocks(transcript: CompactTranscript, block_seconds: int) -> List[Counter]:
+    count = int(transcript.ends[-1] // block_seconds) + 1
+    blocks = [Counter() for _ in range(count)]
+    for start, text in zip(transcript.starts.tolist(), transcript.texts()):
+        blocks[int(start // block_seconds)].update(
+            word for word in WORD.findall(text.lower()) if word not in STOPWORDS
+        )
+    return blocks
+
+
+def _idf(blocks: List[Counter]) -> Dict[str, float]:
+    doc_freq = Counter(word for block in blocks for word in block)
+    return {word: math.log(len(blocks) / freq) + 1 for word, freq in doc_freq.items()}
+
+
+def _cosine(a: Counter, b: Counter, idf: Dict[str, float]) -> float:
+    if len(a) > len(b):
+        a, b = b, a
+    dot = sum(count * b[word] * idf[word] ** 2 for word, count in a.items() if word in b)
+    if not dot:
+        return 0.0
+    norm_a = math.sqrt(sum((count * idf[word]) ** 2 for word, count in a.items()))
+    norm_b = math.sqrt(sum((count * idf[word]) ** 2 for word, count in b.items()))
+    return dot / (norm_a * norm_b)
+
+
+def _window_similarities(blocks: List[Counter], idf: Dict[str, float], size: int) -> np.ndarray:
+    # Similarity across each gap between blocks, with the windows on either side rolled forward
+    # one block at a time instead of re-summed.
+    left, right = Counter(), sum(blocks[:size], Counter())
+    similarities = np.zeros(len(blocks) - 1)
+    for gap in range(1, len(blocks)):
+        left.update(blocks[gap - 1])
+        if gap > size:
+            left.subtract(blocks[gap - 1 - size])
+        right.subtract(blocks[gap - 1])
+        if gap + size - 1 < len(blocks):
+            right.update(blocks[gap + size - 1])
+        similarities[gap - 1] = _cosine(+left, +right, idf)
+    return similarities
+
+
+def _depth_scores(similarities: np.ndarray) -> Dict[int, float]:
+    # TextTiling depth at each local minimum: how far the similarity dips below the nearest
+    # peaks on either side. The peak reached by climbing left (or right) from each gap is carried
+    # along in one pass per direction, so long monotone runs aren't rescanned for every gap.
+    values = similarities.tolist()
+    n = len(values)
+    left_peak, right_peak = values[:], values[:]
+    for i in range(1, n):
+        if values[i - 1] >= values[i]:
+            left_peak[i] = left_peak[i - 1]
+    for i in range(n - 2, -1, -1):
+        if values[i + 1] >= values[i]:
+            right_peak[i] = right_peak[i + 1]
+
+    depths = {}
+    for i, value in enumerate(values):
+        if (i > 0 and values[i - 1] < value) or (i < n - 1 and values[i + 1] < value):
+            continue
+        depths[i] = left_peak[i] - value + right_peak[i] - value
+    return depths
+
+
+def segment_chapters(transcript: CompactTranscript, duration: float = 0) -> List[Chapter]:
+    # Lexical-cohesion segmentation: compare TF-IDF vectors of the blocks before and after each
+    # gap, split where the vocabulary shifts most, and name chapters after their salient terms.
+    if not transcript.segment_count:
+        return []
+
+    duration = max(float(duration or 0), float(transcript.ends[-1]))
+    blocks = _blocks(transcript, BLOCK_SECONDS)
+    if len(blocks) < 2 * COMPARE_BLOCKS:
+        return []
+
+    similarities = _window_similarities(blocks, _idf(blocks), COMPARE_BLOCKS)
+    # Light smoothing so single noisy blocks don't create minima.
+    similarities = np.convolve(np.pad(similarities, 1, mode="edge"), np.ones(3) / 3, mode="valid")
+    depths = _depth_scores(similarities)
+    values = np.fromiter(depths.values(), dtype=np.float64)
+    # Only dips deeper than the average local minimum become boundaries.
+    cutoff = float(values.mean())
+    # Long streams get longer chapters rather than an unreadable list.
+    min_seconds = max(MIN_CHAPTER_SECONDS, duration / MAX_CHAPTERS)
+
+    boundaries: List[float] = []
+    for gap in sorted(depths, key=depths.get, reverse=True):
+        if depths[gap] <= cutoff or len(boundaries) + 1 >= MAX_CHAPTERS:
+            break
+        # Snap to the first segment starting at or after the gap.
+        index = int(np.searchsorted(transcript.starts, (gap + 1) * BLOCK_SECONDS))
+        if index >= transcript.segment_count:
+            continue
+        time = float(transcript.starts[index])
+        if time < min_seconds or duration - time < min_seconds:
+            continue
+        if any(abs(time - other) < min_seconds for other in boundaries):
+            continue
+        boundaries.append(time)
+
+    if len(boundaries) + 1 < MIN_CHAPTERS:
+        return []
+
+    starts = [0.0] + sorted(boundaries)
+    ends = starts[1:] + [duration]
+    idf = _idf(blocks)
+    return [
+        {"start_time": start, "end_time": end, "title": _title(blocks, idf, start, end)}
+        for start, end in zip(starts, ends)
+    ]
+
+
+def _title(blocks: List[Counter], idf: Dict[str, float], start: float, end: float) -> str:
+    counts = sum(blocks[int(start // BLOCK_SECONDS):int(math.ceil(end / BLOCK_SECONDS))], Counter())
+    # Prefer terms that recur within the chapter over one-off rare words.
+    ranked = sorted(counts, key=lambda word: (counts[word] > 1, counts[word] * idf[word]), reverse=True)
+    terms = [word.capitalize() for word in ranked[:TITLE_TERMS]]
+    return ", ".join(terms) if terms else "Untitled"
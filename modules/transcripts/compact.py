@@ -0,0 +1,188 @@
+from collections.abc import Mapping, Sequence
+from typing import TYPE_CHECKING, Dict, Iterable, Iterator, List, Optional, Union
+
+import numpy as np
+
+if TYPE_CHECKING:
+    # Type-only: importing pipeline at runtime would load every step from this leaf module.
+    from pipeline.context import Transcript, TranscriptSegment
+
+KEYS = ("text", "segments", "duration", "source")
+
+
+class CompactTranscript(Mapping):
+    # Columnar transcript for long streams: segment times live in float arrays and all segment
+    # texts in one string (joined by single spaces, which is also the transcript "text"), with
+    # offsets into it. Reads like the Transcript dict, and slices share the underlying buffers.
+
+    __slots__ = ("starts", "ends", "_offsets", "_buffer", "duration", "source")
+
+    def __init__(self, starts: np.ndarray, ends: np.ndarray, offsets: np.ndarray, buffer: str,
+                 duration: float, source: str):
+        self.starts = starts
+        self.ends = ends
+        self._offsets = offsets
+        self._buffer = buffer
+        self.duration = duration
+        self.source = source
+
+    @classmethod
+    def from_columns(cls, starts: Iterable[float], ends: Iterable[float], texts: List[str],
+                     source: str, duration: Optional[float] = None) -> "CompactTranscript":
+        count = len(texts)
+        offsets = np.zeros(count + 1, dtype=np.int64)
+        np.cumsum(np.fromiter((len(text) + 1 for text in texts), dtype=np.int64, count=count), out=offsets[1:])
+        starts = np.fromiter(starts, dtype=np.float64, count=count)
+        ends = np.fromiter(ends, dtype=np.float64, count=count)
+        if duration is None:
+            duration = float(ends[-1]) if count else 0.0
+        return cls(starts, ends, offsets, " ".join(texts), duration, source)
+
+    @classmethod
+    def from_segments(cls, segments: Iterable["TranscriptSegment"], source: str,
+                      duration: Optional[float] = None) -> "CompactTranscript":
+        starts, ends, texts = [], [], []
+        for seg in segments:
+            starts.append(seg["start"])
+            ends.append(seg["end"])
+            texts.append(seg["text"].strip())
+        return cls.from_columns(starts, ends, texts, source, duration)
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "CompactTranscript":
+        # Accepts both the plain Transcript shape and the output of to_columns().
+        if "offsets" in data:
+            return cls(
+                np.asarray(data["start"], dtype=np.float64),
+                np.asarray(data["end"], dtype=np.float64),
+                np.asarray(data["offsets"], dtype=np.int64),
+                data["buffer"],
+                data["duration"],
+                data["source"],
+            )
+        return cls.from_segments(data.get("segments") or [], data.get("source"), data.get("duration"))
+
+    def __getitem__(self, key: str):
+        if key == "text":
+            return self.text
+        if key == "segments":
+            return SegmentsView(self)
+        if key == "duration":
+            return self.duration
+        if key == "source":
+            return self.source
+        raise KeyError(key)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(KEYS)
+
+    def __len__(self) -> int:
+        return len(KEYS)
+
+    def __repr__(self) -> str:
+        return f"CompactTranscript(source={self.source!r}, segments={self.segment_count}, duration={self.duration})"
+
+    @property
+    def segment_count(self) -> int:
+        return len(self.starts)
+
+    @property
+    def text(self) -> str:
+        if not self.segment_count:
+            return ""
+        return self._buffer[self._offsets[0]:self._offsets[-1] - 1]
+
+    def segment_text(self, index: int) -> str:
+        return self._buffer[self._offsets[index]:self._offsets[index + 1] - 1]
+
+    def texts(self) -> List[str]:
+        bounds = self._offsets.tolist()
+        return [self._buffer[lo:hi - 1] for lo, hi in zip(bounds, bounds[1:])]
+
+    def segment_at(self, positions) -> np.ndarray:
+        # Maps character positions in `text` to segment indices.
+        return np.searchsorted(self._offsets[1:] - self._offsets[0], positions, side="right")
+
+    def slice_index(self, lo: int, hi: int) -> "CompactTranscript":
+        hi = max(lo, hi)
+        return CompactTranscript(
+            self.starts[lo:hi],
+            self.ends[lo:hi],
+            self._offsets[lo:hi + 1],
+            self._buffer,
+            float(self.ends[hi - 1]) if hi > lo else 0.0,
+            self.source,
+        )
+
+    def slice_time(self, start: float, end: float) -> "CompactTranscript":
+        # Segments starting in [start, end), like bisect_left on the segment starts.
+        lo, hi = np.searchsorted(self.starts, [start, end], side="left")
+        return self.slice_index(int(lo), int(hi))
+
+    def to_dict(self) -> "Transcript":
+        return {
+            "text": self.text,
+            "segments": [
+                {"start": start, "end": end, "text": text}
+                for start, end, text in zip(self.starts.tolist(), self.ends.tolist(), self.texts())
+            ],
+            "duration": self.duration,
+            "source": self.source,
+        }
+
+    def to_columns(self) -> Dict:
+        # Serializes without building per-segment objects; from_dict() reads it back.
+        base = int(self._offsets[0]) if self.segment_count else 0
+        return {
+            "start": self.starts.tolist(),
+            "end": self.ends.tolist(),
+            "offsets": (self._offsets - base).tolist(),
+            "buffer": self.text,
+            "duration": self.duration,
+            "source": self.source,
+        }
+
+
+class SegmentsView(Sequence):
+    # List-of-dicts view over a CompactTranscript; items are built on access.
+
+    __slots__ = ("_transcript",)
+
+    def __init__(self, transcript: CompactTranscript):
+        self._transcript = transcript
+
+    def __len__(self) -> int:
+        return self._transcript.segment_count
+
+    def __getitem__(self, index: Union[int, slice]):
+        transcript = self._transcript
+        if isinstance(index, slice):
+            lo, hi, step = index.indices(len(self))
+            if step != 1:
+                return [self[i] for i in range(lo, hi, step)]
+            return SegmentsView(transcript.slice_index(lo, hi))
+
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("segment index out of range")
+        return {
+            "start": float(transcript.starts[index]),
+            "end": float(transcript.ends[index]),
+            "text": transcript.segment_text(index),
+        }
+
+    def __iter__(self) -> Iterator["TranscriptSegment"]:
+        transcript = self._transcript
+        for start, end, text in zip(transcript.starts.tolist(), transcript.ends.tolist(), transcript.texts()):
+            yield {"start": start, "end": end, "text": text}
+
+
+def as_compact(transcript: Optional[Dict]):
+    # Accepts plain transcripts and to_columns() output. Plain transcripts without segments
+    # (e.g. text-only user input) are returned unchanged.
+    if transcript is None or isinstance(transcript, CompactTranscript):
+        return transcript
+    if "offsets" not in transcript and not transcript.get("segments"):
+        return transcript
+    return CompactTranscript.from_dict(transcript)
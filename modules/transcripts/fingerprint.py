@@ -0,0 +1,179 @@
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from modules.whisper.audio import SAMPLE_RATE
+
+# Landmarks are taken from audio downsampled to 8 kHz, which keeps the speech band.
+DOWNSAMPLE = 2
+FFT_SIZE = 512
+HOP_SIZE = 128
+MIN_BIN, MAX_BIN = 4, 256
+PEAK_TIME_FRAMES = 6
+PEAK_FREQ_BINS = 4
+PEAK_DB = 10.0
+PEAKS_PER_SECOND = 8
+FAN_OUT = 5
+# Peak time differences are hashed in steps of two frames, so sub-frame shifts mostly survive.
+DELTA_STEP = 2
+MAX_DELTA_STEPS = 63
+CHUNK_FRAMES = 4096
+
+SILENCE_DB = -55.0
+# Mostly silent or flat audio is not fingerprinted; callers fall back to the video ID.
+MIN_ACTIVE_FRACTION = 0.25
+MIN_LOUDNESS_STD_DB = 3.0
+MIN_LANDMARKS = 500
+
+STORED_LANDMARKS = 256
+LOOKUP_LANDMARKS = 64
+MIN_MATCHING_LANDMARKS = 20
+DURATION_BUCKET_SECONDS = 30
+
+
+@dataclass(frozen=True)
+class AudioFingerprint:
+    # Rounded duration plus the smallest landmark hashes (a bottom-k min-hash of the landmark
+    # set). Shifted, trimmed or re-encoded copies share most of these hashes, so a lookup votes
+    # with its smallest LOOKUP_LANDMARKS against the STORED_LANDMARKS of earlier audio.
+    duration: int
+    landmarks: Tuple[int, ...]
+
+    def stored_keys(self) -> List[str]:
+        return [_landmark_key(self.duration, value) for value in self.landmarks[:STORED_LANDMARKS]]
+
+    def lookup_keys(self) -> List[str]:
+        # Neighbouring duration buckets too, so a few seconds of trimming across a bucket edge still match.
+        return [
+            _landmark_key(self.duration + offset, value)
+            for offset in (-DURATION_BUCKET_SECONDS, 0, DURATION_BUCKET_SECONDS)
+            for value in self.landmarks[:LOOKUP_LANDMARKS]
+        ]
+
+
+def _landmark_key(duration: int, value: int) -> str:
+    return f"{duration}:{value:016x}"
+
+
+class AudioFingerprinter:
+    # Spectral peaks (local maxima in time and frequency, strongest PEAKS_PER_SECOND kept) are
+    # paired with the next few peaks; each pair hashes its two frequencies and their time
+    # difference only, so hashes don't depend on where in the file they occur. Audio can be fed
+    # in chunks of any size; peaks near chunk edges are found once the next chunk arrives.
+
+    def __init__(self, sample_rate: int = SAMPLE_RATE):
+        self.sample_rate = sample_rate
+        self._window = np.hanning(FFT_SIZE).astype(np.float32)
+        self._samples = 0
+        self._odd_sample = np.empty(0, dtype=np.float32)
+        self._pending = np.empty(0, dtype=np.float32)
+        self._frames = 0
+        self._tail = np.empty((0, MAX_BIN - MIN_BIN), dtype=np.float32)
+        self._tail_loud = np.empty(0, dtype=np.float32)
+        self._loudness: List[np.ndarray] = []
+        self._peaks: List[Tuple[np.ndarray, np.ndarray, np.ndarray]] = []
+
+    def feed(self, audio: np.ndarray):
+        self._samples += len(audio)
+        audio = np.concatenate([self._odd_sample, audio])
+        even = len(audio) - len(audio) % DOWNSAMPLE
+        self._odd_sample = audio[even:]
+        downsampled = audio[:even].reshape(-1, DOWNSAMPLE).mean(axis=1)
+        self._pending = np.concatenate([self._pending, downsampled])
+
+        chunk = (CHUNK_FRAMES - 1) * HOP_SIZE + FFT_SIZE
+        while len(self._pending) >= chunk:
+            self._spectrum(self._pending[:chunk], final=False)
+            self._pending = self._pending[CHUNK_FRAMES * HOP_SIZE:]
+
+    def _spectrum(self, audio: np.ndarray, final: bool):
+        if len(audio) >= FFT_SIZE:
+            frames = np.lib.stride_tricks.sliding_window_view(audio, FFT_SIZE)[::HOP_SIZE]
+            loudness = 10 * np.log10(np.einsum("ij,ij->i", frames, frames) / FFT_SIZE + 1e-12)
+            spectrum = np.abs(np.fft.rfft(frames * self._window, axis=1))[:, MIN_BIN:MAX_BIN]
+            spectrum = 20 * np.log10(spectrum + 1e-10).astype(np.float32)
+            self._loudness.append(loudness)
+        else:
+            loudness = np.empty(0, dtype=np.float32)
+            spectrum = np.empty((0, MAX_BIN - MIN_BIN), dtype=np.float32)
+
+        # Frames kept from the previous chunk give the peak search its full time neighbourhood.
+        start = self._frames - len(self._tail)
+        combined = np.concatenate([self._tail, spectrum])
+        combined_loud = np.concatenate([self._tail_loud, loudness])
+        self._frames += len(spectrum)
+
+        lo = PEAK_TIME_FRAMES if start > 0 else 0
+        hi = len(combined) if final else len(combined) - PEAK_TIME_FRAMES
+        if hi > lo:
+            self._find_peaks(combined, combined_loud, start, lo, hi)
+
+        keep = 2 * PEAK_TIME_FRAMES
+        self._tail, self._tail_loud = combined[-keep:], combined_loud[-keep:]
+
+    def _find_peaks(self, spectrum: np.ndarray, loudness: np.ndarray, start: int, lo: int, hi: int):
+        neighbourhood = spectrum.copy()
+        for k in range(1, PEAK_FREQ_BINS + 1):
+            np.maximum(neighbourhood[:, k:], spectrum[:, :-k], out=neighbourhood[:, k:])
+            np.maximum(neighbourhood[:, :-k], spectrum[:, k:], out=neighbourhood[:, :-k])
+        local_max = neighbourhood.copy()
+        for k in range(1, PEAK_TIME_FRAMES + 1):
+            np.maximum(local_max[k:], neighbourhood[:-k], out=local_max[k:])
+            np.maximum(local_max[:-k], neighbourhood[k:], out=local_max[:-k])
+
+        region = spectrum[lo:hi]
+        floor = np.median(region, axis=1, keepdims=True) + PEAK_DB
+        is_peak = (region == local_max[lo:hi]) & (region > floor) & (loudness[lo:hi, None] > SILENCE_DB)
+        times, bins = np.nonzero(is_peak)
+        self._peaks.append((times + start + lo, bins + MIN_BIN, region[times, bins]))
+
+    def result(self) -> Optional[AudioFingerprint]:
+        self._spectrum(self._pending, final=True)
+        self._pending = np.empty(0, dtype=np.float32)
+        if not self._frames:
+            return None
+
+        loudness = np.concatenate(self._loudness)
+        if np.mean(loudness > SILENCE_DB) < MIN_ACTIVE_FRACTION or np.std(loudness) < MIN_LOUDNESS_STD_DB:
+            return None
+
+        times = np.concatenate([peaks[0] for peaks in self._peaks]).astype(np.int64)
+        bins = np.concatenate([peaks[1] for peaks in self._peaks]).astype(np.int64)
+        strength = np.concatenate([peaks[2] for peaks in self._peaks])
+
+        # One threshold for the whole file keeps peak selection independent of position.
+        seconds = self._samples / self.sample_rate
+        count = min(len(strength), int(PEAKS_PER_SECOND * seconds))
+        if count < FAN_OUT + 1:
+            return None
+        strongest = strength >= np.partition(strength, len(strength) - count)[len(strength) - count]
+        times, bins = times[strongest], bins[strongest]
+        order = np.lexsort((bins, times))
+        times, bins = times[order], bins[order]
+
+        hashes = []
+        for k in range(1, FAN_OUT + 1):
+            delta = (times[k:] - times[:-k] + DELTA_STEP // 2) // DELTA_STEP
+            valid = (delta > 0) & (delta <= MAX_DELTA_STEPS)
+            hashes.append(((bins[:-k] << 14) | (bins[k:] << 6) | delta)[valid])
+        landmarks = np.unique(_mix(np.concatenate(hashes).astype(np.uint64)))
+        if len(landmarks) < MIN_LANDMARKS:
+            return None
+
+        duration = int(round(seconds / DURATION_BUCKET_SECONDS)) * DURATION_BUCKET_SECONDS
+        return AudioFingerprint(duration, tuple(int(value) for value in landmarks[:STORED_LANDMARKS]))
+
+
+def _mix(values: np.ndarray) -> np.ndarray:
+    # splitmix64 finalizer, so the smallest hashes are a uniform sample of the landmark set.
+    with np.errstate(over="ignore"):
+        values = (values ^ (values >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        values = (values ^ (values >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+        return values ^ (values >> np.uint64(31))
+
+
+def audio_fingerprint(audio: np.ndarray, sample_rate: int = SAMPLE_RATE) -> Optional[AudioFingerprint]:
+    fingerprinter = AudioFingerprinter(sample_rate)
+    fingerprinter.feed(audio)
+    return fingerprinter.result()
@@ -0,0 +1,191 @@
+import json
+import math
+import os
+from functools import lru_cache
+from typing import Dict, FrozenSet, List, Optional, Tuple
+
+import numpy as np
+
+from modules.transcripts.compact import CompactTranscript
+from util import logger
+
+WINDOW_SECONDS = int(os.getenv("ENGAGEMENT_WINDOW_SECONDS", "60"))
+LONG_GAP_SECONDS = 30
+# Optional JSON file mapping game titles (or "default") to extra hype words. Per-game words are
+# opt-in only; without it the score uses the built-in list alone.
+HYPE_VOCAB_PATH = os.getenv("HYPE_VOCAB_PATH")
+
+DEFAULT_HYPE_WORDS = frozenset({
+    "insane", "omg", "crazy", "wtf", "bro", "cheater", "legit", "clutch", "fucking",
+    "laugh", "go", "run", "sick", "god",
+})
+
+
+@lru_cache(maxsize=1)
+def _custom_vocabulary() -> Dict[str, FrozenSet[str]]:
+    if not HYPE_VOCAB_PATH:
+        return {}
+    try:
+        with open(HYPE_VOCAB_PATH) as f:
+            data = json.load(f)
+    except Exception as e:
+        logger.warning(f"⚠️ Failed to load hype vocabulary from {HYPE_VOCAB_PATH}: {e}")
+        return {}
+    return {game.strip().lower(): frozenset(word.lower() for word in words) for game, words in data.items()}
+
+
+def hype_vocabulary(game_title: Optional[str] = None) -> FrozenSet[str]:
+    custom = _custom_vocabulary()
+    game = (game_title or "").strip().lower()
+    return (
+            DEFAULT_HYPE_WORDS
+            | custom.get("default", frozenset())
+            | custom.get(game, frozenset())
+    )
+
+
+# Unicode whitespace above ASCII, matching what str.split() separates on.
+UNICODE_SPACES = np.array([133, 160, 5760, *range(8192, 8203), 8232, 8233, 8239, 8287, 12288], dtype=np.uint32)
+
+
+def _lower_ascii(codes: np.ndarray) -> np.ndarray:
+    return codes + ((codes >= 65) & (codes <= 90)) * np.uint32(32)
+
+
+def _word_key(length, first, last):
+    return (np.uint64(length) << np.uint64(42)) | (np.uint64(first) << np.uint64(21)) | np.uint64(last)
+
+
+@lru_cache(maxsize=32)
+def _vocabulary_keys(vocabulary: FrozenSet[str]) -> np.ndarray:
+    return np.array(sorted(int(_word_key(len(word), ord(word[0]), ord(word[-1]))) for word in vocabulary),
+                    dtype=np.uint64)
+
+
+def split_words(text: str) -> Tuple[np.ndarray, np.ndarray]:
+    # Start and end offsets of the whitespace-separated words of text (same words as str.split()),
+    # found with array operations instead of a Python loop.
+    chars = np.frombuffer(text.encode("utf-32-le"), dtype=np.uint32)
+    is_space = (chars == 32) | ((chars >= 9) & (chars <= 13)) | ((chars >= 28) & (chars <= 31))
+    high = np.flatnonzero(chars >= UNICODE_SPACES[0])
+    is_space[high[np.isin(chars[high], UNICODE_SPACES)]] = True
+
+    edges = np.flatnonzero(np.diff(is_space, prepend=True, append=True))
+    return edges[0::2], edges[1::2]
+
+
+def match_words(text: str, starts: np.ndarray, ends: np.ndarray, vocabulary: FrozenSet[str]) -> np.ndarray:
+    # Words whose length and first/last letters match a vocabulary word are candidates; only those
+    # are compared as strings, so the Python work scales with matches rather than with all words.
+    lowered = text.lower()
+    if len(lowered) == len(text):
+        # Lowercasing kept every offset, so keys come from fully lowercased words (any script).
+        chars = np.frombuffer(lowered.encode("utf-32-le"), dtype=np.uint32)
+        keys = _word_key(ends - starts, chars[starts], chars[ends - 1])
+        candidates = np.flatnonzero(np.isin(keys, _vocabulary_keys(vocabulary)))
+    else:
+        # A few characters (e.g. "İ") lowercase to more than one; keys then only lowercase ASCII,
+        # and words with other characters are always compared as strings.
+        chars = np.frombuffer(text.encode("utf-32-le"), dtype=np.uint32)
+        keys = _word_key(ends - starts, _lower_ascii(chars[starts]), _lower_ascii(chars[ends - 1]))
+        non_ascii = np.concatenate([[0], np.cumsum(chars > 127)])
+        candidates = np.flatnonzero(np.isin(keys, _vocabulary_keys(vocabulary))
+                                    | (non_ascii[ends] > non_ascii[starts]))
+
+    matches = np.zeros(len(starts), dtype=bool)
+    for i, start, end in zip(candidates.tolist(), starts[candidates].tolist(), ends[candidates].tolist()):
+        matches[i] = text[start:end].lower() in vocabulary
+    return matches
+
+
+class TranscriptScorer:
+    # Scores a transcript that may arrive in pieces (see TranscriptFeed): word and hype counts are
+    # taken per piece as it comes in, so only the totals are left once the transcript is complete.
+
+    def __init__(self, game_title: Optional[str] = None):
+        self.vocabulary = hype_vocabulary(game_title)
+        self.long_gaps = 0
+        self._starts: List[np.ndarray] = []
+        self._ends: List[np.ndarray] = []
+        self._words: List[np.ndarray] = []
+        self._hype: List[np.ndarray] = []
+        self._last_end: Optional[float] = None
+
+    def add(self, transcript: CompactTranscript):
+        if not transcript.segment_count:
+            return
+        starts, ends = transcript.starts, transcript.ends
+
+        # Words of the piece's text are located at once and mapped back to their segments.
+        text = transcript.text
+        word_starts, word_ends = split_words(text)
+        segment = transcript.segment_at(word_starts)
+        is_hype = match_words(text, word_starts, word_ends, self.vocabulary)
+        self._words.append(np.bincount(segment, minlength=transcript.segment_count))
+        self._hype.append(np.bincount(segment[is_hype], minlength=transcript.segment_count))
+
+        self.long_gaps += int(np.count_nonzero(starts[1:] - ends[:-1] > LONG_GAP_SECONDS))
+        if self._last_end is not None and starts[0] - self._last_end > LONG_GAP_SECONDS:
+            self.long_gaps += 1
+        self._last_end = float(ends[-1])
+        self._starts.append(starts)
+        self._ends.append(ends)
+
+    def result(self, duration: Optional[float], window_seconds: int = WINDOW_SECONDS) -> Tuple[float, Dict, Dict]:
+        starts, ends, words, hype = (
+            np.concatenate(parts) if parts else np.zeros(0)
+            for parts in (self._starts, self._ends, self._words, self._hype)
+        )
+
+        total_words = int(words.sum())
+        hype_count = int(hype.sum())
+        long_gaps = self.long_gaps
+        duration = duration or 0
+        wpm = total_words / (duration / 60 if duration > 0 else 1)
+
+        score = 0.0
+        if wpm > 40:
+            score += 0.4
+        elif wpm > 20:
+            score += 0.2
+
+        if hype_count > 10:
+            score += 0.3
+        elif hype_count > 5:
+            score += 0.2
+
+        if long_gaps == 0:
+            score += 0.3
+        elif long_gaps < 3:
+            score += 0.1
+
+        stats = {"wpm": wpm, "hype": hype_count, "gaps": long_gaps}
+        return round(score, 2), stats, engagement_curve(starts, ends, words, hype, duration, window_seconds)
+
+
+def score_transcript(transcript: CompactTranscript, duration: Optional[float],
+                     game_title: Optional[str] = None,
+                     window_seconds: int = WINDOW_SECONDS) -> Tuple[float, Dict, Dict]:
+    scorer = TranscriptScorer(game_title)
+    scorer.add(transcript)
+    return scorer.result(duration, window_seconds)
+
+
+def engagement_curve(starts: np.ndarray, ends: np.ndarray, words: np.ndarray, hype: np.ndarray,
+                     duration: float, window_seconds: int = WINDOW_SECONDS) -> Dict:
+    # Per-window words per minute, hype words per 100 words and the share of the window with no
+    # speech. Segments count towards the window they start in.
+    end = max(duration, float(ends[-1]) if len(ends) else 0)
+    count = max(1, math.ceil(end / window_seconds))
+    window = np.minimum((starts // window_seconds).astype(np.int64), count - 1)
+
+    window_words = np.bincount(window, weights=words, minlength=count)
+    window_hype = np.bincount(window, weights=hype, minlength=count)
+    speech = np.bincount(window, weights=np.clip(ends - starts, 0, None), minlength=count)
+
+    return {
+        "window_seconds": window_seconds,
+        "wpm": np.round(window_words * 60 / window_seconds, 1).tolist(),
+        "hype_density": np.round(window_hype * 100 / np.maximum(window_words, 1), 2).tolist(),
+        "silence": np.round(1 - np.minimum(speech / window_seconds, 1), 2).tolist(),
+    }
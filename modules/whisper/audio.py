@@ -0,0 +1,18 @@
+import numpy as np
+
+# Decoded audio throughout the pipeline: 16 kHz mono float32, as Whisper expects.
+SAMPLE_RATE = 16000
+FRAME_SECONDS = 0.1
+
+
+def frame_energy(audio: np.ndarray, frame_seconds: float = FRAME_SECONDS,
+                 sample_rate: int = SAMPLE_RATE) -> np.ndarray:
+    # Sum of squares per frame; a trailing partial frame is dropped.
+    frame = int(sample_rate * frame_seconds)
+    n_frames = len(audio) // frame
+    frames = audio[:n_frames * frame].reshape(n_frames, frame)
+    return np.einsum("ij,ij->i", frames, frames)
+
+
+def quietest_frame(energy: np.ndarray, lo: int, hi: int) -> int:
+    return lo + int(np.argmin(energy[lo:hi]))
@@ -0,0 +1,139 @@
+import collections
+import os
+import queue
+import threading
+from typing import Dict, Iterable, Iterator, Optional, Tuple
+
+import ffmpeg
+import numpy as np
+
+from modules.whisper.audio import SAMPLE_RATE, FRAME_SECONDS, frame_energy, quietest_frame
+from modules.whisper.models import whisper_models
+from modules.whisper.stream import TranscriptBuilder, ProgressReporter, consume_segments
+
+BYTES_PER_SAMPLE = 4
+READ_SECONDS = 5
+# Decoded audio held ahead of a slow consumer; ffmpeg is paused (by pipe backpressure) beyond it.
+BUFFER_SECONDS = int(os.getenv("WHISPER_STREAM_BUFFER_SECONDS", "300"))
+WINDOW_SECONDS = float(os.getenv("WHISPER_STREAM_WINDOW_SECONDS", "120"))
+SILENCE_SEARCH_SECONDS = 10.0
+STDERR_TAIL_LINES = 50
+
+
+class AudioStream:
+    # Decodes a remote audio URL to 16 kHz mono float32 through ffmpeg. Output is read on a
+    # background thread so the download keeps going while earlier windows are being transcribed,
+    # up to BUFFER_SECONDS ahead. stderr is drained continuously so ffmpeg never blocks on it.
+
+    def __init__(self, url: str, headers: Optional[Dict[str, str]] = None):
+        input_args = {}
+        if headers:
+            input_args["headers"] = "".join(f"{name}: {value}\r\n" for name, value in headers.items())
+
+        self._process = (
+            ffmpeg
+            .input(url, **input_args)
+            .output("pipe:", format="f32le", ac=1, ar=SAMPLE_RATE)
+            .global_args("-nostdin", "-loglevel", "error")
+            .run_async(pipe_stdout=True, pipe_stderr=True)
+        )
+        self._chunks: "queue.Queue[Optional[np.ndarray]]" = queue.Queue(maxsize=max(1, BUFFER_SECONDS // READ_SECONDS))
+        self._closed = threading.Event()
+        self._stderr_tail: "collections.deque[str]" = collections.deque(maxlen=STDERR_TAIL_LINES)
+        self._reader = threading.Thread(target=self._read, name="audio-stream", daemon=True)
+        self._stderr_reader = threading.Thread(target=self._drain_stderr, name="audio-stream-stderr", daemon=True)
+        self._reader.start()
+        self._stderr_reader.start()
+
+    def _read(self):
+        size = READ_SECONDS * SAMPLE_RATE * BYTES_PER_SAMPLE
+        try:
+            while not self._closed.is_set():
+                data = self._process.stdout.read(size)
+                if not data:
+                    break
+                usable = len(data) - len(data) % BYTES_PER_SAMPLE
+                self._put(np.frombuffer(data[:usable], dtype=np.float32))
+        finally:
+            self._put(None)
+
+    def _put(self, item: Optional[np.ndarray]):
+        # Blocks while the queue is full, but gives up once the stream is closed.
+        while not self._closed.is_set():
+            try:
+                self._chunks.put(item, timeout=0.5)
+                return
+            except queue.Full:
+                continue
+
+    def _drain_stderr(self):
+        for line in self._process.stderr:
+            self._stderr_tail.append(line.decode(errors="replace").rstrip())
+
+    def chunks(self) -> Iterator[np.ndarray]:
+        while True:
+            chunk = self._chunks.get()
+            if chunk is None:
+                break
+            yield chunk
+
+        code = self._process.wait()
+        if code != 0:
+            self._stderr_reader.join(timeout=5)
+            stderr = "\n".join(self._stderr_tail)
+            raise RuntimeError(f"ffmpeg audio stream failed ({code}): {stderr[-500:]}")
+
+    def close(self):
+        self._closed.set()
+        if self._process.poll() is None:
+            self._process.kill()
+        self._process.wait()
+        self._reader.join(timeout=5)
+        self._stderr_reader.join(timeout=5)
+
+
+def _quietest_split(audio: np.ndarray, target: int, half_window: int) -> int:
+    frame = int(SAMPLE_RATE * FRAME_SECONDS)
+    energy = frame_energy(audio[target - half_window:target + half_window])
+    return target - half_window + quietest_frame(energy, 0, len(energy)) * frame
+
+
+def silence_windows(chunks: Iterable[np.ndarray], window_seconds: float = WINDOW_SECONDS,
+                    search_seconds: float = SILENCE_SEARCH_SECONDS) -> Iterator[Tuple[float, np.ndarray]]:
+    # Cuts the stream into roughly window_seconds pieces, each ending at the quietest point near
+    # the target length so words aren't split across windows.
+    window = int(window_seconds * SAMPLE_RATE)
+    half_window = int(search_seconds * SAMPLE_RATE / 2)
+    buffer = np.empty(0, dtype=np.float32)
+    pending, pending_length = [], 0
+    offset = 0
+
+    for chunk in chunks:
+        pending.append(chunk)
+        pending_length += len(chunk)
+        if len(buffer) + pending_length < window + half_window:
+            continue
+
+        buffer = np.concatenate([buffer, *pending])
+        pending, pending_length = [], 0
+        while len(buffer) >= window + half_window:
+            split = _quietest_split(buffer, window, half_window)
+            yield offset / SAMPLE_RATE, buffer[:split]
+            offset += split
+            buffer = buffer[split:]
+
+    buffer = np.concatenate([buffer, *pending])
+    if len(buffer):
+        yield offset / SAMPLE_RATE, buffer
+
+
+def transcribe_windows(windows: Iterable[Tuple[float, np.ndarray]], builder: TranscriptBuilder,
+                       reporter: ProgressReporter) -> Optional[str]:
+    model = whisper_models.get()
+    language = None
+    for offset, window in windows:
+        # The first window's detected language is kept so later windows skip detection.
+        segments, info = model.transcribe(window, beam_size=5, language=language)
+        consume_segments(segments, builder, reporter, offset)
+        language = language or info.language
+    return language
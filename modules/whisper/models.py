@@ -0,0 +1,128 @@
+import gc
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, Tuple
+
+from faster_whisper import WhisperModel
+
+from util import logger
+
+MODEL_SIZE = os.getenv("WHISPER_MODEL_SIZE", "medium")
+DEVICE = os.getenv("WHISPER_DEVICE", "cuda")
+COMPUTE_TYPE = os.getenv("WHISPER_COMPUTE_TYPE") or ("float16" if DEVICE == "cuda" else "int8")
+MEMORY_BUDGET_MB = int(os.getenv("WHISPER_MEMORY_BUDGET_MB", "8000"))
+
+# Rough resident footprint of each model at float16, used for budget accounting only.
+MODEL_FOOTPRINT_MB = {
+    "tiny": 150,
+    "base": 300,
+    "small": 1000,
+    "medium": 2600,
+    "large-v1": 4700,
+    "large-v2": 4700,
+    "large-v3": 4700,
+    "distil-large-v3": 3000,
+}
+COMPUTE_TYPE_FACTOR = {
+    "float32": 2.0,
+    "float16": 1.0,
+    "bfloat16": 1.0,
+    "int8_float16": 0.6,
+    "int8_float32": 0.6,
+    "int8": 0.5,
+}
+
+ModelKey = Tuple[str, str, str]
+
+
+def estimate_footprint_mb(key: ModelKey) -> int:
+    size, _, compute_type = key
+    base = MODEL_FOOTPRINT_MB.get(size, MODEL_FOOTPRINT_MB["medium"])
+    return int(base * COMPUTE_TYPE_FACTOR.get(compute_type, 1.0))
+
+
+class WhisperModelRegistry:
+    def __init__(self, memory_budget_mb: int):
+        self.memory_budget_mb = memory_budget_mb
+        self._models: "OrderedDict[ModelKey, WhisperModel]" = OrderedDict()
+        self._loading: Dict[ModelKey, Future] = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="whisper-warm")
+
+    def get(self, size: str = MODEL_SIZE, device: str = DEVICE, compute_type: str = COMPUTE_TYPE) -> WhisperModel:
+        return self._acquire((size, device, compute_type), background=False).result()
+
+    def warm(self, size: str = MODEL_SIZE, device: str = DEVICE, compute_type: str = COMPUTE_TYPE) -> Future:
+        return self._acquire((size, device, compute_type), background=True)
+
+    def evict(self, size: str, device: str, compute_type: str) -> bool:
+        with self._lock:
+            model = self._models.pop((size, device, compute_type), None)
+        if model is None:
+            return False
+        del model
+        gc.collect()
+        return True
+
+    def loaded(self):
+        with self._lock:
+            return list(self._models.keys())
+
+    def _acquire(self, key: ModelKey, background: bool) -> Future:
+        with self._lock:
+            model = self._models.get(key)
+            if model is not None:
+                self._models.move_to_end(key)
+                future = Future()
+                future.set_result(model)
+                return future
+
+            future = self._loading.get(key)
+            if future is not None:
+                return future
+
+            future = Future()
+            self._loading[key] = future
+
+        if background:
+            self._executor.submit(self._load, key, future)
+        else:
+            self._load(key, future)
+        return future
+
+    def _load(self, key: ModelKey, future: Future):
+        size, device, compute_type = key
+        try:
+            self._make_room(key)
+            logger.info(f"🧩 Loading Whisper model {size} ({device}/{compute_type})")
+            model = WhisperModel(size, device=device, compute_type=compute_type)
+        except Exception as e:
+            logger.error(f"❌ Failed to load Whisper model {size}: {e}")
+            with self._lock:
+                self._loading.pop(key, None)
+            future.set_exception(e)
+            return
+
+        with self._lock:
+            self._models[key] = model
+            self._loading.pop(key, None)
+        future.set_result(model)
+
+    def _make_room(self, key: ModelKey):
+        needed = estimate_footprint_mb(key)
+        evicted = []
+        with self._lock:
+            used = sum(estimate_footprint_mb(k) for k in self._models)
+            while self._models and used + needed > self.memory_budget_mb:
+                old_key, _ = self._models.popitem(last=False)
+                used -= estimate_footprint_mb(old_key)
+                evicted.append(old_key)
+
+        if evicted:
+            logger.info(f"♻️ Evicted Whisper models to fit budget: {', '.join(k[0] for k in evicted)}")
+            gc.collect()
+
+
+whisper_models = WhisperModelRegistry(MEMORY_BUDGET_MB)
@@ -0,0 +1,142 @@
+import atexit
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from typing import List, Optional, Tuple
+
+import numpy as np
+from faster_whisper import WhisperModel
+
+from modules.whisper.audio import SAMPLE_RATE, FRAME_SECONDS, frame_energy, quietest_frame
+from modules.whisper.models import MODEL_SIZE, DEVICE
+from util import logger
+
+CPU_WORKERS = int(os.getenv("WHISPER_CPU_WORKERS", "0")) or max(1, (os.cpu_count() or 1) // 4)
+CHUNK_SECONDS = float(os.getenv("WHISPER_CHUNK_SECONDS", "600"))
+SILENCE_SEARCH_SECONDS = 30.0
+# CPU transcription goes through the worker pool instead of the shared model registry.
+USE_PARALLEL = DEVICE == "cpu" and CPU_WORKERS > 1
+
+_worker_model: Optional[WhisperModel] = None
+
+# The pool outlives each job so its workers keep their loaded models; it's only replaced when its
+# settings change or a worker dies.
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_key: Optional[Tuple[int, int, str]] = None
+_pool_lock = threading.Lock()
+
+
+def find_silence_splits(audio: np.ndarray, chunk_seconds: float = CHUNK_SECONDS,
+                        search_seconds: float = SILENCE_SEARCH_SECONDS) -> List[int]:
+    frame = int(SAMPLE_RATE * FRAME_SECONDS)
+    energy = frame_energy(audio)
+    n_frames = len(energy)
+    if n_frames == 0:
+        return []
+
+    chunk_frames = int(chunk_seconds / FRAME_SECONDS)
+    half_window = int(search_seconds / FRAME_SECONDS / 2)
+
+    splits = []
+    target = chunk_frames
+    while target + half_window < n_frames - chunk_frames // 2:
+        lo = max(target - half_window, 1)
+        hi = target + half_window
+        quietest = quietest_frame(energy, lo, hi)
+        splits.append(quietest * frame)
+        target = quietest + chunk_frames
+
+    return splits
+
+
+def _init_worker(model_size: str, cpu_threads: int):
+    global _worker_model
+    _worker_model = WhisperModel(model_size, device="cpu", compute_type="int8", cpu_threads=cpu_threads)
+
+
+def _transcribe_chunk(index: int, offset: float, audio: np.ndarray) -> Tuple[int, List[Tuple[float, float, str]], str]:
+    segments, info = _worker_model.transcribe(audio, beam_size=5)
+    return index, [(seg.start + offset, seg.end + offset, seg.text) for seg in segments], info.language
+
+
+def _get_pool(workers: int, cpu_threads: int, model_size: str) -> ProcessPoolExecutor:
+    global _pool, _pool_key
+    key = (workers, cpu_threads, model_size)
+    with _pool_lock:
+        if _pool is not None and _pool_key != key:
+            _pool.shutdown(wait=True, cancel_futures=True)
+            _pool = None
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(model_size, cpu_threads),
+            )
+            _pool_key = key
+        return _pool
+
+
+def _discard_pool(pool: ProcessPoolExecutor):
+    global _pool, _pool_key
+    with _pool_lock:
+        if _pool is pool:
+            _pool, _pool_key = None, None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def shutdown_pool():
+    with _pool_lock:
+        pool = _pool
+    if pool is not None:
+        _discard_pool(pool)
+
+
+atexit.register(shutdown_pool)
+
+
+def transcribe_parallel(audio: np.ndarray, builder, reporter, workers: int = CPU_WORKERS,
+                        chunk_seconds: float = CHUNK_SECONDS, model_size: str = MODEL_SIZE) -> str:
+    bounds = [0] + find_silence_splits(audio, chunk_seconds) + [len(audio)]
+    chunks = [(i, bounds[i] / SAMPLE_RATE, audio[bounds[i]:bounds[i + 1]]) for i in range(len(bounds) - 1)]
+
+    # The pool is sized for the configured workers, not this job's chunk count, so it can be
+    # reused as is; short jobs just leave some workers idle.
+    workers = max(1, workers)
+    cpu_threads = max(1, (os.cpu_count() or 1) // workers)
+    logger.info(f"🧵 Transcribing {len(chunks)} chunk(s) on {min(workers, len(chunks))} CPU worker(s) "
+                f"x {cpu_threads} thread(s)")
+
+    languages = {}
+    finished = {}
+    next_index = 0
+
+    pool = _get_pool(workers, cpu_threads, model_size)
+    futures = []
+    try:
+        futures.extend(pool.submit(_transcribe_chunk, *chunk) for chunk in chunks)
+        del chunks
+
+        for future in as_completed(futures):
+            index, segments, language = future.result()
+            finished[index] = segments
+            languages[index] = language
+
+            # Merge in chunk order so the builder always holds a contiguous prefix.
+            while next_index in finished:
+                for start, end, text in finished.pop(next_index):
+                    builder.add(start, end, text)
+                reporter.update(bounds[next_index + 1] / SAMPLE_RATE)
+                next_index += 1
+    except BrokenProcessPool:
+        # A crashed worker (usually out of memory) breaks the whole pool; the next job starts a new one.
+        _discard_pool(pool)
+        raise
+    finally:
+        # Leave no chunks of a failed job queued ahead of the next one.
+        for future in futures:
+            future.cancel()
+
+    return languages.get(0, "")
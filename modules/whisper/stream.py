@@ -0,0 +1,118 @@
+import os
+import threading
+import time
+from typing import Callable, Iterable, Iterator, Optional
+
+from modules.transcripts.compact import CompactTranscript
+
+PROGRESS_INTERVAL = float(os.getenv("TRANSCRIBE_PROGRESS_INTERVAL", "15"))
+# Segments handed to feed consumers at a time while transcription is still running.
+FEED_BATCH_SEGMENTS = int(os.getenv("TRANSCRIPT_FEED_BATCH_SEGMENTS", "100"))
+
+
+class TranscriptFeed:
+    # A transcript that is still being written, published so later steps can start on its prefix.
+    # Segments added while transcribing are handed out in batches; finish() supplies the complete
+    # transcript, of which the added segments must be a prefix (none at all for captions or a
+    # cached transcript), and its remaining segments are handed out last.
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._starts: list[float] = []
+        self._ends: list[float] = []
+        self._texts: list[str] = []
+        self._transcript: Optional[CompactTranscript] = None
+        self._done = False
+        self.failed = False
+
+    def add(self, start: float, end: float, text: str):
+        with self._cond:
+            self._starts.append(start)
+            self._ends.append(end)
+            self._texts.append(text)
+            if len(self._texts) % FEED_BATCH_SEGMENTS == 0:
+                self._cond.notify_all()
+
+    def finish(self, transcript: Optional[CompactTranscript]):
+        with self._cond:
+            self._transcript = transcript
+            self._done = True
+            self._cond.notify_all()
+
+    def fail(self):
+        with self._cond:
+            self.failed = self._done = True
+            self._cond.notify_all()
+
+    def chunks(self, stop: threading.Event, batch: int = FEED_BATCH_SEGMENTS) -> Iterator[CompactTranscript]:
+        # Ends early, without the rest of the transcript, if transcription fails or `stop` is set.
+        consumed = 0
+        while True:
+            with self._cond:
+                while not (self._done or stop.is_set() or len(self._texts) - consumed >= batch):
+                    self._cond.wait(1.0)
+                if self.failed or stop.is_set():
+                    return
+                done, transcript = self._done, self._transcript
+                count = len(self._texts)
+                starts, ends, texts = self._starts[consumed:count], self._ends[consumed:count], self._texts[consumed:count]
+
+            if done:
+                if transcript is not None and transcript.segment_count > consumed:
+                    yield transcript.slice_index(consumed, transcript.segment_count)
+                return
+            yield CompactTranscript.from_columns(starts, ends, texts, "")
+            consumed = count
+
+
+class TranscriptBuilder:
+    def __init__(self, source: str, feed: Optional[TranscriptFeed] = None):
+        self.source = source
+        self.feed = feed
+        self.starts: list[float] = []
+        self.ends: list[float] = []
+        self.texts: list[str] = []
+        self.end = 0.0
+
+    def add(self, start: float, end: float, text: str):
+        self.end = end
+        text = text.strip()
+        if not text:
+            return
+        self.starts.append(start)
+        self.ends.append(end)
+        self.texts.append(text)
+        if self.feed is not None:
+            self.feed.add(start, end, text)
+
+    def build(self) -> CompactTranscript:
+        return CompactTranscript.from_columns(self.starts, self.ends, self.texts, self.source,
+                                              self.end if self.texts else 0)
+
+
+class ProgressReporter:
+    def __init__(self, total_seconds: Optional[float], report: Callable[[Optional[float], float], None],
+                 interval: float = PROGRESS_INTERVAL):
+        self.total_seconds = total_seconds or 0
+        self.report = report
+        self.interval = interval
+        self._last_report = time.monotonic()
+
+    def update(self, position_seconds: float):
+        now = time.monotonic()
+        if now - self._last_report < self.interval:
+            return
+        self._last_report = now
+
+        percent = None
+        if self.total_seconds > 0:
+            percent = round(min(position_seconds / self.total_seconds, 1.0) * 100, 1)
+        self.report(percent, position_seconds)
+
+
+def consume_segments(segments: Iterable, builder: TranscriptBuilder, reporter: ProgressReporter,
+                     offset: float = 0.0) -> TranscriptBuilder:
+    for seg in segments:
+        builder.add(seg.start + offset, seg.end + offset, seg.text)
+        reporter.update(seg.end + offset)
+    return builder
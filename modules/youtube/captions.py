@@ -0,0 +1,312 @@
+import codecs
+import json
+import os
+import re
+import threading
+import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from modules.transcripts.compact import CompactTranscript
+from util import logger, http_client, record_metrics
+
+if TYPE_CHECKING:
+    from pipeline.context import TranscriptSegment
+
+PREFERRED_LANGS = ["en", "en-US", "en-GB"]
+# In order of preference: json3 and srv3 carry exact timings per event, vtt is the fallback.
+PREFERRED_FORMATS = ["json3", "srv3", "vtt"]
+FETCH_WORKERS = int(os.getenv("CAPTION_FETCH_WORKERS", "4"))
+CHUNK_SIZE = 64 * 1024
+# Normalized segments end at sentence punctuation, a pause, or whichever of these limits comes first.
+SEGMENT_MAX_SECONDS = 15.0
+SEGMENT_MAX_CHARS = 250
+SEGMENT_MAX_GAP = 1.5
+OVERLAP_MAX_WORDS = 64
+# Shorter repeats of the emitted tail are left alone, since people really do say "no no no".
+# A repeat of the previous event's last line is always removed, however short.
+OVERLAP_MIN_WORDS = 3
+# Rolling cues touch the previous one (vtt) or overlap it (json3).
+ROLLING_TOLERANCE = 0.05
+SENTENCE_END = (".", "?", "!", "…")
+
+WHITESPACE_OR_COMMA = re.compile(r"[\s,]*")
+VTT_TIMING = re.compile(r"(?:(\d+):)?(\d{2}):(\d{2})\.(\d{3})\s+-->\s+(?:(\d+):)?(\d{2}):(\d{2})\.(\d{3})")
+VTT_TAG = re.compile(r"<[^>]+>")
+
+
+class _Cancelled(Exception):
+    pass
+
+
+def caption_candidates(info_dict) -> List[Tuple[str, str, Dict]]:
+    subtitles = info_dict.get("subtitles") or {}
+    auto_captions = info_dict.get("automatic_captions") or {}
+
+    candidates = []
+    for source_name, tracks_by_lang in (("User", subtitles), ("Auto", auto_captions)):
+        for lang in PREFERRED_LANGS:
+            track = _pick_format(tracks_by_lang.get(lang) or [])
+            if track:
+                candidates.append((source_name, lang, track))
+    return candidates
+
+
+def _pick_format(tracks: List[Dict]) -> Optional[Dict]:
+    by_ext = {track.get("ext"): track for track in tracks if track.get("url")}
+    for ext in PREFERRED_FORMATS:
+        if ext in by_ext:
+            return by_ext[ext]
+    return None
+
+
+def fetch_best_captions(info_dict) -> Optional[CompactTranscript]:
+    # All candidates download concurrently; the best-ranked one that parses wins and the
+    # lower-ranked downloads still in flight are abandoned.
+    candidates = caption_candidates(info_dict)
+    if not candidates:
+        return None
+
+    stops = [threading.Event() for _ in candidates]
+    pool = ThreadPoolExecutor(max_workers=min(FETCH_WORKERS, len(candidates)), thread_name_prefix="captions")
+    try:
+        futures = [
+            pool.submit(_fetch_track, source_name, track, stop)
+            for (source_name, _, track), stop in zip(candidates, stops)
+        ]
+        for i, ((source_name, lang, track), future) in enumerate(zip(candidates, futures)):
+            try:
+                transcript, stats = future.result()
+            except Exception as e:
+                logger.error(f"⚠️ Failed to fetch {source_name} captions ({lang}, {track.get('ext')}): {e}")
+                continue
+            if transcript:
+                for stop in stops[i + 1:]:
+                    stop.set()
+                logger.info(f"💬 Using {source_name} captions ({lang}, {track.get('ext')}, "
+                            f"{transcript.segment_count} segments)")
+                record_metrics("captions", **stats)
+                return transcript
+        return None
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _fetch_track(source_name: str, track: Dict, stop: threading.Event) -> Tuple[Optional[CompactTranscript], Dict]:
+    stats: Dict = {}
+    if stop.is_set():
+        return None, stats
+
+    with http_client.get(track["url"], stream=True) as response:
+        response.raise_for_status()
+        chunks = _cancellable(response.iter_content(CHUNK_SIZE), stop)
+        parser = PARSERS[track["ext"]]
+        # Only auto vtt/srv3 tracks roll; json3 ASR events already carry just the new words.
+        dedupe = source_name == "Auto" and track["ext"] != "json3"
+        try:
+            segments = normalize_segments(parser(chunks), stats, dedupe=dedupe)
+            transcript = CompactTranscript.from_segments(segments, source_name)
+        except _Cancelled:
+            return None, stats
+
+    return (transcript if transcript.segment_count else None), stats
+
+
+def _cancellable(chunks: Iterable[bytes], stop: threading.Event) -> Iterator[bytes]:
+    for chunk in chunks:
+        if stop.is_set():
+            raise _Cancelled()
+        yield chunk
+
+
+def normalize_segments(segments: Iterable["TranscriptSegment"], stats: Optional[Dict] = None,
+                       dedupe: bool = True) -> Iterator["TranscriptSegment"]:
+    # Auto captions arrive as "rolling" events: each one repeats the tail of the previous one and
+    # stays on screen until the next has started. In vtt, a cue starts with the previous cue's
+    # last line, and a 10 ms "hold" cue repeats the finished line on its own. With `dedupe`, an
+    # event that touches or overlaps the previous one loses the words it repeats: the whole
+    # previous event, its last line (lines are separated by "\n"), or at least OVERLAP_MIN_WORDS
+    # of the emitted tail. Words are then regrouped into non-overlapping, sentence-like segments.
+    # `stats` receives the before/after counts.
+    tail: List[str] = []
+    previous: List[str] = []
+    previous_line: List[str] = []
+    words: List[str] = []
+    start = end = last_end = raw_end = 0.0
+    segments_in = chars_in = segments_out = chars_out = 0
+
+    def flush():
+        nonlocal words, last_end, segments_out, chars_out
+        text = " ".join(words)
+        segments_out += 1
+        chars_out += len(text) + 1
+        last_end = end
+        words = []
+        return {"start": start, "end": end, "text": text}
+
+    for segment in segments:
+        incoming = segment["text"].split()
+        segments_in += 1
+        # +1 for the space joining segments in the transcript text.
+        chars_in += len(segment["text"]) + 1
+
+        overlapping = segment["start"] <= raw_end + ROLLING_TOLERANCE
+        raw_end = max(raw_end, segment["end"])
+        raw, raw_line = incoming, segment["text"].rsplit("\n", 1)[-1].split()
+        if dedupe and overlapping:
+            incoming = incoming[_repeated_words(previous, previous_line, tail, incoming):]
+        previous, previous_line = raw, raw_line
+        if not incoming:
+            continue
+        tail = (tail + incoming)[-OVERLAP_MAX_WORDS:]
+
+        piece_start = max(segment["start"], last_end)
+        if words:
+            # The previous event only lasts until this one starts.
+            end = max(start, min(end, piece_start))
+            if (piece_start - end > SEGMENT_MAX_GAP or piece_start - start > SEGMENT_MAX_SECONDS
+                    or sum(map(len, words)) + len(words) > SEGMENT_MAX_CHARS
+                    or words[-1].endswith(SENTENCE_END)):
+                yield flush()
+                piece_start = max(piece_start, last_end)
+        if not words:
+            start = piece_start
+        words.extend(incoming)
+        end = max(piece_start, segment["end"])
+
+    if words:
+        yield flush()
+
+    if stats is not None:
+        stats.update({
+            "segments_in": segments_in,
+            "segments_out": segments_out,
+            "chars_in": chars_in,
+            "chars_out": chars_out,
+            "reduction": round(1 - chars_out / chars_in, 3) if chars_in else 0.0,
+        })
+
+
+def _repeated_words(previous: List[str], previous_line: List[str], tail: List[str], words: List[str]) -> int:
+    for repeat in (previous, previous_line):
+        if repeat and words[:len(repeat)] == repeat:
+            return len(repeat)
+    # Longest suffix of `tail` that `words` starts with, if it's long enough to be a repeat.
+    for size in range(min(len(tail), len(words)), OVERLAP_MIN_WORDS - 1, -1):
+        if tail[-size:] == words[:size]:
+            return size
+    return 0
+
+
+def _segment(start: float, end: float, text: str) -> Optional["TranscriptSegment"]:
+    text = text.strip()
+    if not text:
+        return None
+    return {"start": start, "end": end, "text": text}
+
+
+def parse_json3(chunks: Iterable[bytes]) -> Iterator["TranscriptSegment"]:
+    # Decodes the "events" array one event at a time instead of loading the whole document.
+    decoder = json.JSONDecoder()
+    buffer = ""
+    in_events = False
+
+    for chunk in _decode_utf8(chunks):
+        buffer += chunk
+        pos = 0
+
+        if not in_events:
+            key = buffer.find('"events"')
+            bracket = buffer.find("[", key) if key >= 0 else -1
+            if bracket < 0:
+                continue
+            in_events = True
+            pos = bracket + 1
+
+        while True:
+            pos = WHITESPACE_OR_COMMA.match(buffer, pos).end()
+            if pos < len(buffer) and buffer[pos] == "]":
+                return
+            try:
+                event, pos = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                break
+
+            if "segs" not in event:
+                continue
+            start = event.get("tStartMs", 0) / 1000
+            end = start + event.get("dDurationMs", 0) / 1000
+            segment = _segment(start, end, "".join(seg.get("utf8", "") for seg in event["segs"]))
+            if segment:
+                yield segment
+
+        buffer = buffer[pos:]
+
+
+def parse_srv3(chunks: Iterable[bytes]) -> Iterator["TranscriptSegment"]:
+    parser = ET.XMLPullParser(events=("end",))
+    for chunk in chunks:
+        parser.feed(chunk)
+        for _, element in parser.read_events():
+            if element.tag != "p":
+                continue
+            start = int(element.get("t", 0)) / 1000
+            end = start + int(element.get("d", 0)) / 1000
+            segment = _segment(start, end, "".join(element.itertext()))
+            element.clear()
+            if segment:
+                yield segment
+
+
+def parse_vtt(chunks: Iterable[bytes]) -> Iterator["TranscriptSegment"]:
+    timing = None
+    lines: List[str] = []
+
+    for line in _iter_lines(_decode_utf8(chunks)):
+        match = VTT_TIMING.search(line)
+        if match:
+            timing = _vtt_seconds(match.groups()[:4]), _vtt_seconds(match.groups()[4:])
+            lines = []
+        elif line == "":
+            if timing and lines:
+                segment = _segment(timing[0], timing[1], VTT_TAG.sub("", "\n".join(lines)))
+                if segment:
+                    yield segment
+            timing, lines = None, []
+        elif timing and line.strip():
+            # Auto captions pad cues with a " " line; only a truly empty line ends the cue.
+            lines.append(line.strip())
+
+    if timing and lines:
+        segment = _segment(timing[0], timing[1], VTT_TAG.sub("", "\n".join(lines)))
+        if segment:
+            yield segment
+
+
+def _vtt_seconds(parts) -> float:
+    hours, minutes, seconds, millis = parts
+    return int(hours or 0) * 3600 + int(minutes) * 60 + int(seconds) + int(millis) / 1000
+
+
+def _decode_utf8(chunks: Iterable[bytes]) -> Iterator[str]:
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    for chunk in chunks:
+        yield decoder.decode(chunk)
+    yield decoder.decode(b"", final=True)
+
+
+def _iter_lines(texts: Iterable[str]) -> Iterator[str]:
+    pending = ""
+    for text in texts:
+        pending += text
+        *lines, pending = pending.split("\n")
+        yield from (line.rstrip("\r") for line in lines)
+    if pending:
+        yield pending
+
+
+PARSERS = {
+    "json3": parse_json3,
+    "srv3": parse_srv3,
+    "vtt": parse_vtt,
+}
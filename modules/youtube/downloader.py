@@ -1,45 +1,116 @@
+import copy
 import os
+import time
 import yt_dlp as youtube_dl
-import requests
-from typing import Dict, List, Union
+from typing import Callable, Dict, List, Optional, Tuple, Union
 
+from modules.transcripts.cache import transcript_cache
+from modules.youtube.captions import fetch_best_captions
 from util import logger
 
-
-def extract_video_info(url: str, output_dir: str) -> Dict:
+VIDEO_FORMAT = 'bestvideo[ext=mp4][vcodec^=h264][vcodec!=av01]+bestaudio[ext=m4a]/bestvideo+bestaudio'
+# Whisper resamples to 16 kHz mono, so the smallest audio-only stream at or above these is enough.
+AUDIO_MIN_ABR = int(os.getenv("AUDIO_MIN_ABR", "48"))
+AUDIO_MIN_ASR = 16000
+AUDIO_FORMAT = f'ba[abr>=?{AUDIO_MIN_ABR}][asr>=?{AUDIO_MIN_ASR}]/ba'
+MUXED_AUDIO_FORMAT = 'b[acodec!=none]'
+# "+" inverts the preference, so the selectors above pick the smallest matching stream.
+SMALLEST_FIRST = ['+abr', '+size', '+br', '+res']
+ALLOW_MUXED_AUDIO = os.getenv("ALLOW_MUXED_AUDIO", "false").lower() == "true"
+FRAGMENT_CONCURRENCY = int(os.getenv("YTDLP_FRAGMENT_CONCURRENCY", "8"))
+# Hand the selected audio URL to the transcribe step instead of downloading it to disk.
+STREAM_AUDIO = os.getenv("WHISPER_STREAM_AUDIO", "false").lower() == "true"
+
+
+def extract_video_info(url: str, output_dir: str, on_audio_download: Optional[Callable] = None,
+                       stream_audio: bool = STREAM_AUDIO) -> Dict:
     os.makedirs(output_dir, exist_ok=True)
     path = None
+    audio_stream = None
+    download_stats = None
 
-    # 1. Extract info without downloading
-    ydl_opts_info = _get_options(output_dir, download=False)
-    with youtube_dl.YoutubeDL(ydl_opts_info) as ydl:
-        info = ydl.extract_info(url, download=False)
+    # 1. Extract info once; the unprocessed result is reused for the audio download below
+    with youtube_dl.YoutubeDL(_get_options(output_dir, VIDEO_FORMAT)) as ydl:
+        raw_info = ydl.extract_info(url, download=False, process=False)
+        info = ydl.process_ie_result(copy.deepcopy(raw_info), download=False)
 
     captions = fetch_captions(info)
     chapters = extract_chapters(info)
 
     # 2. Decide whether to download audio or skip
     if not captions:
-        ydl_opts_audio = _get_options(output_dir, download=True)
-        with youtube_dl.YoutubeDL(ydl_opts_audio) as ydl:
-            info = ydl.extract_info(url, download=True)
-            path = ydl.prepare_filename(info)
+        audio_format = _audio_format(raw_info)
+        if on_audio_download:
+            on_audio_download()
+
+        if stream_audio:
+            with youtube_dl.YoutubeDL(_get_options(output_dir, audio_format, SMALLEST_FIRST)) as ydl:
+                selected = ydl.process_ie_result(raw_info, download=False)
+            audio_stream = {
+                "url": selected["url"],
+                "headers": selected.get("http_headers") or {},
+                "format_id": selected.get("format_id"),
+            }
+            logger.info(f"🎧 Streaming audio format {selected.get('format_id')} ({selected.get('abr') or '?'} kbps)")
+        else:
+            selected, download_stats = download_audio(raw_info, output_dir, audio_format)
+            path = selected["requested_downloads"][0]["filepath"]
+            logger.info(f"🎧 Downloaded audio format {selected.get('format_id')} ({selected.get('abr') or '?'} kbps)")
 
     return {
         "info": info,
         "path": path,
+        "audio_stream": audio_stream,
+        "download_stats": download_stats,
         "captions": captions,
         "chapters": chapters,
     }
 
 
-def _get_options(output_dir: str, download: bool) -> Dict:
-    format_str = (
-        'bestvideo[ext=mp4][vcodec^=h264][vcodec!=av01]+bestaudio[ext=m4a]/bestvideo+bestaudio'
-        if not download else
-        'bestaudio/best'
+def download_audio(raw_info: Dict, output_dir: str, audio_format: str = AUDIO_FORMAT) -> Tuple[Dict, Dict]:
+    # Partial files stay in output_dir, so a rerun of the same job picks up where it left off.
+    stats = {"bytes": 0, "fragments": 0}
+
+    def on_progress(progress: Dict):
+        if progress.get("status") == "downloading":
+            stats["fragments"] = max(stats["fragments"], progress.get("fragment_count") or 0)
+        elif progress.get("status") == "finished":
+            stats["bytes"] += progress.get("downloaded_bytes") or progress.get("total_bytes") or 0
+
+    options = _get_options(output_dir, audio_format, SMALLEST_FIRST)
+    options.update({
+        'outtmpl': os.path.join(output_dir, '%(id)s.%(format_id)s.%(ext)s'),
+        'concurrent_fragment_downloads': FRAGMENT_CONCURRENCY,
+        'continuedl': True,
+        'progress_hooks': [on_progress],
+    })
+
+    started = time.monotonic()
+    with youtube_dl.YoutubeDL(options) as ydl:
+        selected = ydl.process_ie_result(raw_info, download=True)
+    elapsed = time.monotonic() - started
+
+    stats["seconds"] = round(elapsed, 2)
+    stats["throughput_mbps"] = round(stats["bytes"] * 8 / elapsed / 1e6, 2) if elapsed > 0 else 0.0
+    return selected, stats
+
+
+def _audio_format(info: Dict) -> str:
+    formats = info.get("formats") or []
+    has_audio_only = any(
+        f.get("vcodec") == "none" and f.get("acodec") not in (None, "none")
+        for f in formats
     )
-    return {
+    if has_audio_only:
+        return AUDIO_FORMAT
+    if not ALLOW_MUXED_AUDIO:
+        raise RuntimeError("No audio-only format available; set ALLOW_MUXED_AUDIO=true to download muxed video")
+    logger.warning("⚠️ No audio-only format available, downloading the smallest muxed format")
+    return MUXED_AUDIO_FORMAT
+
+
+def _get_options(output_dir: str, format_str: str, format_sort: Optional[List[str]] = None) -> Dict:
+    options = {
         'outtmpl': os.path.join(output_dir, '%(title)s.%(ext)s'),
         'format': format_str,
         'merge_output_format': 'mp4',
@@ -50,55 +121,21 @@ def _get_options(output_dir: str, download: bool) -> Dict:
         'noprogress': True,
         'cookiefile': os.path.join('cookies', 'cookies.txt'),
     }
+    if format_sort:
+        options['format_sort'] = format_sort
+    return options
 
 
 def fetch_captions(info_dict) -> Union[Dict, None]:
-    preferred_langs = ["en", "en-US", "en-GB"]
-    subtitles = info_dict.get("subtitles", {})
-    auto_captions = info_dict.get("automatic_captions", {})
-
-    caption_sources = []
-    for lang in preferred_langs:
-        if lang in subtitles:
-            caption_sources.append(("User", subtitles[lang]))
-    for lang in preferred_langs:
-        if lang in auto_captions:
-            caption_sources.append(("Auto", auto_captions[lang]))
-
-    for source_name, tracks in caption_sources:
-        if not tracks:
-            continue
-        try:
-            caption_url = tracks[0]["url"]
-            response = requests.get(caption_url)
-            data = response.json()
-
-            segments = []
-            full_text = []
-
-            for event in data.get("events", []):
-                if "segs" not in event:
-                    continue
-                text = "".join(seg["utf8"] for seg in event["segs"]).strip()
-                start = event.get("tStartMs", 0) / 1000
-                duration = event.get("dDurationMs", 0) / 1000
-                end = start + duration
-
-                if text:
-                    segments.append({"start": start, "end": end, "text": text})
-                    full_text.append(text)
-
-            return {
-                "text": " ".join(full_text),
-                "segments": segments,
-                "duration": segments[-1]["end"] if segments else info_dict.get("duration", 0),
-                "source": source_name
-            }
-
-        except Exception as e:
-            logger.error(f"⚠️ Failed to fetch {source_name} captions: {e}")
-
-    return None
+    video_id = info_dict.get("id")
+    cached = transcript_cache.get_by_video(video_id)
+    if cached:
+        return cached
+
+    transcript = fetch_best_captions(info_dict)
+    if transcript:
+        transcript_cache.put(transcript, video_id=video_id)
+    return transcript
 
 
 def extract_chapters(info_dict) -> Union[List[Dict], None]:
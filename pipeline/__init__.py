@@ -7,6 +7,7 @@ import pipeline.steps.download
 import pipeline.steps.check_limits
 import pipeline.steps.transcribe
 import pipeline.steps.transcript_score
+import pipeline.steps.fallback_chapters
 import pipeline.steps.generate_metadata
 import pipeline.steps.generate_thumbnail
 import pipeline.steps.save_output
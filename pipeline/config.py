@@ -4,6 +4,7 @@ PIPELINE_DEFINITIONS = {
         "check_limits",
         "transcribe",
         "transcript_score",
+        "fallback_chapters",
         "generate_metadata",
         "generate_thumbnail",
         "save_output",
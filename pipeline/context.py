@@ -1,5 +1,12 @@
+import os
+import threading
 from dataclasses import dataclass, field
-from typing import Optional, List, Literal, TypedDict
+from typing import TYPE_CHECKING, Callable, Dict, Optional, List, Literal, Set, TypedDict
+
+if TYPE_CHECKING:
+    from modules.whisper.stream import TranscriptFeed
+
+DOWNLOADS_DIR = "downloads"
 
 
 class TranscriptSegment(TypedDict):
@@ -52,6 +59,7 @@ class VideoMetadata(TypedDict, total=False):
     view_count: Optional[int]
     original_url: Optional[str]
     path: Optional[str]
+    audio_stream: Optional[Dict]
 
 
 class OutputData(TypedDict, total=False):
@@ -63,6 +71,8 @@ class OutputData(TypedDict, total=False):
     thumbnail_url: Optional[str]
     thumbnail_url_raw: Optional[str]
     overlay_text: Optional[str]
+    # Live view of the transcript while it's being written; not part of the job's results.
+    transcript_feed: Optional["TranscriptFeed"]
 
 
 @dataclass
@@ -75,7 +85,34 @@ class JobContext:
     output: OutputData = field(default_factory=dict)
 
     output_dir: str = "output"
+    shutdown_on_error: bool = True
 
     status: str = "queued"
     stage: str = "init"
     errors: List[str] = field(default_factory=list)
+    published: Set[str] = field(default_factory=set)
+
+    lock: threading.RLock = field(default_factory=threading.RLock, repr=False, compare=False)
+    # Set when a worker gives up on the job; no new steps start and no more callbacks are sent.
+    cancelled: threading.Event = field(default_factory=threading.Event, repr=False, compare=False)
+    publish_listeners: List[Callable[[], None]] = field(default_factory=list, repr=False, compare=False)
+
+    @property
+    def download_dir(self) -> str:
+        # Per-job workspace for downloaded media. It's removed once transcription succeeds or the
+        # job is rejected; other failures keep it for a retry until the worker sweeps it.
+        return os.path.join(self.output_dir, DOWNLOADS_DIR, self.job_id)
+
+    def update_output(self, **values):
+        with self.lock:
+            self.output.update(values)
+
+    def publish(self, **values):
+        # Unlike update_output, marks the fields as final so steps that only read them can start
+        # before the step writing them has finished.
+        with self.lock:
+            self.output.update(values)
+            self.published.update(values)
+            listeners = list(self.publish_listeners)
+        for listener in listeners:
+            listener()
@@ -0,0 +1,111 @@
+import os
+from concurrent.futures import Future, InvalidStateError, ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import AbstractSet, Callable, Dict, List, Set
+
+from pipeline.context import JobContext
+from pipeline.registry import STEP_REGISTRY
+from util import logger
+
+MAX_PARALLEL_STEPS = int(os.getenv("PIPELINE_MAX_PARALLEL_STEPS", "4"))
+
+
+def _overlaps(a: str, b: str) -> bool:
+    return a == "*" or b == "*" or a == b or a.startswith(b + ".") or b.startswith(a + ".")
+
+
+def _touches(keys_a, keys_b) -> bool:
+    return any(_overlaps(a, b) for a in keys_a for b in keys_b)
+
+
+def _conflicts(earlier: Callable, later: Callable) -> bool:
+    return (
+            _touches(earlier.writes, later.reads)
+            or _touches(earlier.reads, later.writes)
+            or _touches(earlier.writes, later.writes)
+    )
+
+
+def _satisfied_early(earlier: Callable, later: Callable, published: AbstractSet[str]) -> bool:
+    # A dependency that only exists because `later` reads what `earlier` writes is met as soon as
+    # every such field has been published.
+    if _touches(earlier.reads, later.writes) or _touches(earlier.writes, later.writes):
+        return False
+    needed = [w for w in earlier.writes if any(_overlaps(w, r) for r in later.reads)]
+    return all(w != "*" and w in published for w in needed)
+
+
+def plan_dependencies(step_names: List[str]) -> Dict[int, Set[int]]:
+    steps = [STEP_REGISTRY[name] for name in step_names]
+    return {
+        i: {j for j in range(i) if _conflicts(steps[j], steps[i])}
+        for i in range(len(steps))
+    }
+
+
+def execute_steps(ctx: JobContext, step_names: List[str], on_error: Callable[[str, Exception], None]) -> bool:
+    known = []
+    for step_name in step_names:
+        if step_name not in STEP_REGISTRY:
+            logger.error(f"Step '{step_name}' not found in registry")
+            continue
+        known.append(step_name)
+
+    dependencies = plan_dependencies(known)
+    started: Set[int] = set()
+    completed: Set[int] = set()
+    failed = False
+
+    steps = [STEP_REGISTRY[name] for name in known]
+    wakeup = Future()
+
+    def on_publish():
+        try:
+            wakeup.set_result(None)
+        except InvalidStateError:
+            pass
+
+    def is_ready(i: int) -> bool:
+        with ctx.lock:
+            published = set(ctx.published)
+        return all(
+            j in completed or (j in started and _satisfied_early(steps[j], steps[i], published))
+            for j in dependencies[i]
+        )
+
+    with ctx.lock:
+        ctx.publish_listeners.append(on_publish)
+
+    try:
+        with ThreadPoolExecutor(max_workers=MAX_PARALLEL_STEPS, thread_name_prefix=f"job-{ctx.job_id}") as pool:
+            running = {}
+
+            def launch_ready():
+                for i, step_name in enumerate(known):
+                    if i not in started and is_ready(i):
+                        started.add(i)
+                        running[pool.submit(steps[i], ctx)] = i
+
+            launch_ready()
+            while running:
+                finished, _ = wait([*running, wakeup], return_when=FIRST_COMPLETED)
+                if wakeup.done():
+                    wakeup = Future()
+                for future in finished:
+                    if future not in running:
+                        continue
+                    i = running.pop(future)
+                    try:
+                        future.result()
+                        completed.add(i)
+                    except Exception as e:
+                        failed = True
+                        on_error(known[i], e)
+
+                # After a failure or cancellation, let in-flight steps finish but don't start new ones.
+                if not failed and not ctx.cancelled.is_set():
+                    launch_ready()
+    finally:
+        with ctx.lock:
+            ctx.publish_listeners.remove(on_publish)
+
+    return not failed
@@ -1,11 +1,15 @@
 from functools import wraps
-from typing import Callable, Dict
+from typing import Callable, Dict, Iterable, Optional
 from util import benchmark, notify, shutdown_pod
 
 STEP_REGISTRY: Dict[str, Callable] = {}
 
+# Steps that don't declare what they touch are treated as reading and writing everything,
+# which makes them run strictly after and before every other step.
+ALL_KEYS = ("*",)
 
-def step(name: str):
+
+def step(name: str, reads: Optional[Iterable[str]] = None, writes: Optional[Iterable[str]] = None):
     def decorator(fn: Callable):
         @wraps(fn)
         def wrapped(ctx):
@@ -17,12 +21,16 @@ def step(name: str):
                 notify(ctx, name, "done")
                 return result
             except Exception as e:
-                ctx.status = "error"
-                ctx.errors.append(f"{name}: {str(e)}")
+                with ctx.lock:
+                    ctx.status = "error"
+                    ctx.errors.append(f"{name}: {str(e)}")
                 notify(ctx, name, "error", str(e))
-                shutdown_pod()
+                if ctx.shutdown_on_error:
+                    shutdown_pod()
                 raise
 
+        wrapped.reads = tuple(reads) if reads is not None else ALL_KEYS
+        wrapped.writes = tuple(writes) if writes is not None else ALL_KEYS
         STEP_REGISTRY[name] = wrapped
         return wrapped
 
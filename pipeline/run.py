@@ -1,10 +1,15 @@
 import os
 import threading
 
-from pipeline import JobContext, PIPELINE_DEFINITIONS, STEP_REGISTRY
+from pipeline import JobContext, PIPELINE_DEFINITIONS
+from pipeline.context import InputPayload
+from pipeline.executor import execute_steps
 from util import logger, watchdog, notify, shutdown_pod
 from util.fetch_input_payload import fetch_input_payload
 
+JOB_TIMEOUT = 1800
+OUTPUT_DIR = "output"
+
 
 def run_pipeline():
     job_id = os.getenv("JOB_ID")
@@ -13,41 +18,80 @@ def run_pipeline():
     is_dev = os.getenv("IS_DEV", "false").lower() == "true"
 
     payload = fetch_input_payload(job_id, is_dev)
+    ctx = run_job(job_id, payload, is_dev)
+
+    shutdown_pod()
+    return ctx
 
+
+def run_job(job_id: str, payload: InputPayload, is_dev: bool, shutdown_on_error: bool = True) -> JobContext:
     ctx = JobContext(
         job_id=job_id,
         is_dev=is_dev,
-        output_dir="output",
+        output_dir=OUTPUT_DIR,
         webhook_url=os.getenv("WEBHOOK_URL"),
-        input=payload
+        input=payload,
+        shutdown_on_error=shutdown_on_error,
     )
 
-    threading.Thread(target=watchdog, args=(1800, ctx), daemon=True).start()
+    if not shutdown_on_error:
+        return _run_with_timeout(ctx)
+
+    job_finished = threading.Event()
+    threading.Thread(target=watchdog, args=(JOB_TIMEOUT, ctx, job_finished), daemon=True).start()
+
+    try:
+        _run_steps(ctx)
+    finally:
+        job_finished.set()
+
+    return ctx
+
+
+def _run_with_timeout(ctx: JobContext) -> JobContext:
+    # In worker mode a timed-out job fails on its own instead of terminating the pod. Its thread
+    # can't be killed, so it's abandoned: cancelled jobs start no new steps and send no callbacks.
+    errors = []
+
+    def target():
+        try:
+            _run_steps(ctx)
+        except Exception as e:
+            errors.append(e)
+
+    runner = threading.Thread(target=target, name=f"job-{ctx.job_id}", daemon=True)
+    runner.start()
+    runner.join(JOB_TIMEOUT)
 
+    if runner.is_alive():
+        logger.error(f"⏰ Job {ctx.job_id} timed out after {JOB_TIMEOUT}s in step '{ctx.stage}'")
+        with ctx.lock:
+            ctx.status = "error"
+            ctx.errors.append(f"{ctx.stage}: timed out")
+        notify(ctx, ctx.stage, "error", error="Job timed out")
+        ctx.cancelled.set()
+    elif errors:
+        raise errors[0]
+
+    return ctx
+
+
+def _run_steps(ctx: JobContext):
     logger.info(f"🚀 Running pipeline for job: {ctx.job_id} - {ctx.input.get('video_url')}")
 
     pipeline_steps = PIPELINE_DEFINITIONS.get(ctx.input.get("mode"), [])
     if not pipeline_steps:
         logger.error(f"No pipeline defined for mode '{ctx.input.get('mode')}'")
-        return ctx
-
-    for step_name in pipeline_steps:
-        step_fn = STEP_REGISTRY.get(step_name)
-        if not step_fn:
-            logger.error(f"Step '{step_name}' not found in registry")
-            continue
+        return
 
-        try:
-            step_fn(ctx)
-        except Exception as e:
-            logger.error(f"❌ Pipeline step '{step_name}' failed with error: {e}")
+    def on_error(step_name: str, e: Exception):
+        logger.error(f"❌ Pipeline step '{step_name}' failed with error: {e}")
+        if ctx.shutdown_on_error:
             shutdown_pod()
-            break
+
+    execute_steps(ctx, pipeline_steps, on_error)
 
     logger.info(f"🏁 Pipeline complete. Final status: {ctx.status}")
 
     if ctx.status != "error":
         notify(ctx, "done", "done")
-
-    shutdown_pod()
-    return ctx
@@ -1,5 +1,5 @@
 from pipeline import step, JobContext
-from util import logger
+from util import logger, remove_workspace
 
 QUALITY_LIMITS = {
     "1080p": 1920,
@@ -8,7 +8,7 @@ QUALITY_LIMITS = {
 }
 
 
-@step("check_limits")
+@step("check_limits", reads=["input", "video_metadata"], writes=[])
 def run(ctx: JobContext):
     try:
         duration_limit = int(ctx.input.get("duration_limit"))
@@ -24,6 +24,8 @@ def run(ctx: JobContext):
 
     if duration > duration_limit or width > width_limit:
         logger.warning("🛑 Video exceeds allowed limits. Shutting down.")
+        # A rejected video won't be retried, so its download isn't worth keeping.
+        remove_workspace(ctx.download_dir)
         raise RuntimeError("Video exceeds allowed duration or resolution limits.")
 
     logger.info("📏 Video is within allowed duration and quality limits.")
@@ -1,22 +1,33 @@
 from typing import cast
 
-from pipeline import step, JobContext
+from pipeline import step, JobContext, PIPELINE_DEFINITIONS
 from modules.youtube.downloader import extract_video_info
+from modules.whisper.models import whisper_models
+from modules.whisper.parallel import USE_PARALLEL
 from pipeline.context import VideoMetadata
-from util import logger
+from util import logger, record_metrics
 
 
-@step("download")
+@step("download", reads=["input"], writes=["video_metadata"])
 def run(ctx: JobContext):
+    will_transcribe = "transcribe" in PIPELINE_DEFINITIONS.get(ctx.input.get("mode"), [])
+    # The parallel CPU path loads its models in its own worker processes, so warming the shared
+    # registry would only hold a copy nobody uses.
+    warm_model = will_transcribe and not USE_PARALLEL
+
     result = extract_video_info(
         url=ctx.input.get("video_url"),
-        output_dir=ctx.output_dir,
+        output_dir=ctx.download_dir,
+        on_audio_download=whisper_models.warm if warm_model else None,
     )
 
     info = result["info"]
+    if result.get("download_stats"):
+        record_metrics("download", **result["download_stats"])
 
     ctx.output["video_metadata"] = cast(VideoMetadata, {
         "url": ctx.input.get("video_url"),
+        "video_id": info.get("id"),
         "title": info.get("title"),
         "duration": info.get("duration"),
         "resolution": info.get("resolution"),
@@ -33,6 +44,7 @@ def run(ctx: JobContext):
         "channel": info.get("channel") or "",
         "chapters": result.get("chapters") or [],
         "path": result.get("path") or "",
+        "audio_stream": result.get("audio_stream"),
     })
 
     logger.info(f"✅ Video downloaded and metadata extracted")
@@ -0,0 +1,39 @@
+import os
+
+from modules.metadata.generator import polish_chapter_titles
+from modules.transcripts.chapters import segment_chapters
+from modules.transcripts.compact import CompactTranscript, as_compact
+from pipeline import JobContext, step
+from util import logger
+
+POLISH_TITLES = os.getenv("CHAPTER_TITLE_POLISH", "true").lower() == "true"
+
+
+@step("fallback_chapters", reads=["input", "video_metadata.transcript", "video_metadata.chapters",
+                                  "video_metadata.duration"],
+      writes=["chapters"])
+def run(ctx: JobContext):
+    video_metadata = ctx.output.get("video_metadata") or {}
+    if video_metadata.get("chapters"):
+        ctx.update_output(chapters=video_metadata["chapters"])
+        return
+
+    transcript = as_compact(video_metadata.get("transcript"))
+    if not isinstance(transcript, CompactTranscript):
+        logger.info("📑 No segmented transcript, skipping fallback chapters")
+        return
+
+    chapters = segment_chapters(transcript, video_metadata.get("duration") or 0)
+    if not chapters:
+        logger.info("📑 Transcript too short or uniform for chapters")
+        return
+
+    if POLISH_TITLES:
+        excerpts = [transcript.slice_time(ch["start_time"], ch["end_time"]).text for ch in chapters]
+        try:
+            chapters = polish_chapter_titles(chapters, excerpts, ctx.input.get("game_title", ""))
+        except Exception as e:
+            logger.warning(f"⚠️ Chapter title polish failed, keeping term titles: {e}")
+
+    logger.info(f"📑 Generated {len(chapters)} fallback chapters")
+    ctx.update_output(chapters=chapters)
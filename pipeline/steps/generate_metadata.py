@@ -1,13 +1,24 @@
 from pipeline import JobContext, step
 from modules.metadata.generator import generate_metadata
-from util import logger
+from util import logger, notify
 
+EARLY_FIELDS = ("summary", "title", "overlay_text")
 
-@step("generate_metadata")
+
+@step("generate_metadata", reads=["input", "video_metadata"],
+      writes=["title", "description", "summary", "overlay_text"])
 def run(ctx: JobContext):
     mode = ctx.input.get("mode", "standard")
     output = ctx.output
 
+    def on_field(key: str, value: str):
+        if key not in EARLY_FIELDS:
+            return
+        ctx.publish(**{key: value})
+        if key != "summary":
+            logger.info(f"✏️ {key} ready: {value}")
+            notify(ctx, "generate_metadata", "progress")
+
     if mode == "standard":
         score = output.get("video_metadata").get("transcript_score", 0)
         transcript = output.get("video_metadata").get("transcript")
@@ -16,18 +27,19 @@ def run(ctx: JobContext):
 
         if score >= 0.5:
             logger.info("💬 Transcript is rich — using for GPT metadata.")
-            result = generate_metadata(ctx)
+            result = generate_metadata(ctx, on_field)
             ctx.status = "done"
         else:
             logger.warning("⚠️ Transcript is weak — skipping GPT metadata generation.")
             raise RuntimeError("Output is weak. Needs user fine-tuning.")
     else:
-        result = generate_metadata(ctx)
-
+        result = generate_metadata(ctx, on_field)
 
-    output["title"] = result["title"]
-    output["description"] = result["description"]
-    output["summary"] = result["summary"]
-    output["overlay_text"] = result["overlay_text"]
+    ctx.update_output(
+        title=result["title"],
+        description=result["description"],
+        summary=result["summary"],
+        overlay_text=result["overlay_text"],
+    )
 
     logger.info("📦 Metadata generation complete.")
@@ -1,40 +1,32 @@
-import os
-
-import requests
-
 from modules.thumbnail.generator import generate_thumbnail_prompt, generate_thumbnail_image, add_text_top_center, \
-    resize_image_for_youtube
+    decode_thumbnail, encode_image, THUMBNAIL_EXTENSION, THUMBNAIL_CONTENT_TYPE
 from pipeline import JobContext, step
-from util.b2 import upload_to_b2
+from util import http_client
+from util.b2 import Artifact, get_artifact_store
 
 
-@step("generate_thumbnail")
+@step("generate_thumbnail", reads=["input", "title", "summary", "overlay_text"],
+      writes=["thumbnail_url", "thumbnail_url_raw"])
 def run(ctx: JobContext):
-    output_dir = ctx.output_dir
-    os.makedirs(output_dir, exist_ok=True)
-
-    raw_path = os.path.join(output_dir, "thumbnail_raw.jpg")
-    final_path = os.path.join(output_dir, "thumbnail_final.jpg")
-
     prompt = generate_thumbnail_prompt(ctx)
     thumbnail_url = generate_thumbnail_image(prompt)
 
-    response = requests.get(thumbnail_url)
+    response = http_client.get(thumbnail_url)
     response.raise_for_status()
-    with open(raw_path, "wb") as f:
-        f.write(response.content)
 
-    overlay_text = ctx.output.get("overlay_text")
-    add_text_top_center(raw_path, overlay_text, final_path)
-    resize_image_for_youtube(raw_path)
+    # Everything stays in memory: one decode, one resize, and encoded buffers go straight to B2.
+    raw_image = decode_thumbnail(response.content)
+    final_image = add_text_top_center(raw_image, ctx.output.get("overlay_text"))
 
-    thumbnail_path = "output/thumbnail_final.jpg"
-    thumbnail_path_raw = "output/thumbnail_raw.jpg"
-    b2_key = f"thumbnails/{ctx.job_id}.jpg"
-    b2_key_raw = f"thumbnails/{ctx.job_id}_raw.jpg"
+    b2_key = f"thumbnails/{ctx.job_id}.{THUMBNAIL_EXTENSION}"
+    b2_key_raw = f"thumbnails/{ctx.job_id}_raw.{THUMBNAIL_EXTENSION}"
 
-    file_info = upload_to_b2(thumbnail_path, b2_key, "viral-rocket-assets")
-    file_info_raw = upload_to_b2(thumbnail_path_raw, b2_key_raw, "viral-rocket-assets")
+    thumbnail_url, thumbnail_url_raw = get_artifact_store().upload_many([
+        Artifact(key=b2_key, data=encode_image(final_image), content_type=THUMBNAIL_CONTENT_TYPE),
+        Artifact(key=b2_key_raw, data=encode_image(raw_image), content_type=THUMBNAIL_CONTENT_TYPE),
+    ])
 
-    ctx.output["thumbnail_url"] = f"https://f005.backblazeb2.com/file/viral-rocket-assets/{b2_key}"
-    ctx.output["thumbnail_url_raw"] = f"https://f005.backblazeb2.com/file/viral-rocket-assets/{b2_key_raw}"
+    ctx.update_output(
+        thumbnail_url=thumbnail_url,
+        thumbnail_url_raw=thumbnail_url_raw,
+    )
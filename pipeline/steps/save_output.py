@@ -1,13 +1,14 @@
 import os
 import json
 
-import requests
-
 from pipeline import JobContext, step
 from util import logger
+from util.serialize import json_default
+from util.b2 import get_artifact_store
+from modules.thumbnail.generator import THUMBNAIL_EXTENSION
 
 
-@step("save_output")
+@step("save_output", reads=["*"], writes=[])
 def run(ctx: JobContext):
     if not ctx.is_dev:
         return
@@ -22,7 +23,7 @@ def run(ctx: JobContext):
     # Save metadata
     if video_metadata:
         with open(os.path.join(output_dir, "video_metadata.json"), "w") as f:
-            json.dump(video_metadata, f, indent=2)
+            json.dump(video_metadata, f, indent=2, default=json_default)
         logger.info("💾 Video Metadata saved")
 
     # if ctx.chapters:
@@ -35,7 +36,7 @@ def run(ctx: JobContext):
         with open(os.path.join(output_dir, "transcript.txt"), "w") as f:
             f.write(transcript.get("text", ""))
         with open(os.path.join(output_dir, "transcript.json"), "w") as f:
-            json.dump(transcript, f, indent=2)
+            json.dump(transcript, f, indent=2, default=json_default)
         logger.info("💾 Transcript saved")
 
     # Save score if available
@@ -47,6 +48,7 @@ def run(ctx: JobContext):
     # Save metadata
     output_without_video = dict(output)
     output_without_video.pop("video_metadata", None)
+    output_without_video.pop("transcript_feed", None)
     if output_without_video:
         with open(os.path.join(output_dir, "generated_metadata.json"), "w") as f:
             json.dump(output_without_video, f, indent=2)
@@ -55,10 +57,8 @@ def run(ctx: JobContext):
     thumbnail_url = output.get("thumbnail_url")
     if thumbnail_url:
         try:
-            response = requests.get(thumbnail_url)
-            response.raise_for_status()
-            with open(os.path.join(output_dir, "thumbnail.jpg"), "wb") as f:
-                f.write(response.content)
+            with open(os.path.join(output_dir, f"thumbnail.{THUMBNAIL_EXTENSION}"), "wb") as f:
+                f.write(get_artifact_store().read_url(thumbnail_url))
             logger.info("🖼️ Thumbnail saved locally")
         except Exception as e:
             logger.warning(f"⚠️ Failed to save thumbnail: {e}")
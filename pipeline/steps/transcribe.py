@@ -1,50 +1,113 @@
-from faster_whisper import WhisperModel
+from typing import Iterable, Iterator, Optional
+
+import numpy as np
+from faster_whisper import decode_audio
+
+from modules.transcripts.cache import transcript_cache
+from modules.transcripts.compact import as_compact
+from modules.transcripts.fingerprint import AudioFingerprint, AudioFingerprinter, audio_fingerprint
+from modules.whisper.audio import SAMPLE_RATE
+from modules.whisper.audio_stream import AudioStream, silence_windows, transcribe_windows
+from modules.whisper.models import whisper_models
+from modules.whisper.parallel import transcribe_parallel, USE_PARALLEL
+from modules.whisper.stream import TranscriptBuilder, TranscriptFeed, ProgressReporter, consume_segments
 from pipeline import JobContext, step
-from util import logger
+from util import logger, notify, remove_workspace
 
 
-@step("transcribe")
+@step("transcribe", reads=["video_metadata.transcript", "video_metadata.path", "video_metadata.audio_stream",
+                          "video_metadata.duration", "video_metadata.video_id"],
+      writes=["video_metadata.transcript", "transcript_feed"])
 def run(ctx: JobContext):
+    # The feed is published up front so steps that can work on a prefix (transcript_score) start
+    # while Whisper is still running.
+    feed = TranscriptFeed()
+    ctx.publish(transcript_feed=feed)
+    try:
+        _transcribe(ctx, feed)
+    except Exception:
+        feed.fail()
+        raise
+    feed.finish(as_compact(ctx.output["video_metadata"].get("transcript")))
+
+
+def _transcribe(ctx: JobContext, feed: TranscriptFeed):
     video_metadata = ctx.output.get("video_metadata")
     transcript = video_metadata.get("transcript")
     path = video_metadata.get("path")
+    audio_stream = video_metadata.get("audio_stream")
 
     if transcript:
         logger.info("🧠 Using YouTube transcript. Skipping Whisper.")
+        remove_workspace(ctx.download_dir)
         return
 
-    if not path:
+    if not path and not audio_stream:
         raise RuntimeError("No video path found in context.")
 
-    logger.info("🎙️ Starting Whisper transcription...")
+    builder = TranscriptBuilder("Whisper", feed)
+
+    def report(percent: Optional[float], position: float):
+        logger.info(f"🎙️ Transcribed {position:.0f}s" + (f" ({percent:.1f}%)" if percent is not None else ""))
+        notify(ctx, "transcribe", "progress", progress=percent)
+
+    reporter = ProgressReporter(video_metadata.get("duration"), report)
+
+    if path:
+        audio = decode_audio(path, sampling_rate=SAMPLE_RATE)
+        fingerprint = audio_fingerprint(audio)
+        if _use_cached(video_metadata, fingerprint):
+            remove_workspace(ctx.download_dir)
+            return
+
+        logger.info("🎙️ Starting Whisper transcription...")
+        if USE_PARALLEL:
+            language = transcribe_parallel(audio, builder, reporter)
+        else:
+            model = whisper_models.get()
+            segments_gen, info = model.transcribe(audio, beam_size=5)
+            consume_segments(segments_gen, builder, reporter)
+            language = info.language
+    else:
+        # Decode straight from the network; windows are transcribed while the rest is still
+        # downloading. The fingerprint covers the whole file, so it can't be looked up before
+        # transcribing here; it's only recorded for later jobs, and this one relies on the video ID.
+        stream = AudioStream(audio_stream["url"], audio_stream.get("headers"))
+        fingerprinter = AudioFingerprinter()
+        try:
+            chunks = _fingerprinted(stream.chunks(), fingerprinter)
+
+            logger.info("🎙️ Starting streaming Whisper transcription...")
+            if USE_PARALLEL:
+                # CPU workers split the whole file at silences, so they need all of it first.
+                language = transcribe_parallel(np.concatenate(list(chunks)), builder, reporter)
+            else:
+                language = transcribe_windows(silence_windows(chunks), builder, reporter)
+        finally:
+            stream.close()
+        fingerprint = fingerprinter.result()
 
-    model_size = "medium"
-    device = "cuda"
-    compute_type = "float16" if device == "cuda" else "int8"
+    transcript = builder.build()
+    video_metadata["transcript"] = transcript
+    transcript_cache.put(transcript, video_id=video_metadata.get("video_id"), fingerprint=fingerprint)
 
-    model = WhisperModel(model_size, device=device, compute_type=compute_type)
+    logger.info(f"📝 Whisper transcript complete. Language: {language}")
+    remove_workspace(ctx.download_dir)
 
-    segments_gen, info = model.transcribe(path, beam_size=5)
-    segments = list(segments_gen)
 
-    transcript_segments = []
-    full_text = []
+def _fingerprinted(chunks: Iterable[np.ndarray], fingerprinter: AudioFingerprinter) -> Iterator[np.ndarray]:
+    for chunk in chunks:
+        fingerprinter.feed(chunk)
+        yield chunk
 
-    for seg in segments:
-        text = seg.text.strip()
-        if text:
-            transcript_segments.append({
-                "start": seg.start,
-                "end": seg.end,
-                "text": text
-            })
-            full_text.append(text)
 
-    video_metadata["transcript"] = {
-        "text": " ".join(full_text),
-        "segments": transcript_segments,
-        "duration": segments[-1].end if transcript_segments else 0,
-        "source": "Whisper"
-    }
+def _use_cached(video_metadata, fingerprint: Optional[AudioFingerprint]) -> bool:
+    # No fingerprint (silent or flat audio) means only the video ID cache applies.
+    cached = transcript_cache.get_by_fingerprint(fingerprint)
+    if not cached:
+        return False
 
-    logger.info(f"📝 Whisper transcript complete. Language: {info.language}")
+    logger.info("🧠 Using cached transcript for matching audio. Skipping Whisper.")
+    video_metadata["transcript"] = cached
+    transcript_cache.put(cached, video_id=video_metadata.get("video_id"))
+    return True
@@ -0,0 +1,49 @@
+import os
+import time
+
+from pipeline.context import DOWNLOADS_DIR
+from pipeline.run import run_job, OUTPUT_DIR
+from util import logger, shutdown_pod, sweep_workspaces
+from util.fetch_input_payload import fetch_next_job
+
+POLL_INTERVAL = float(os.getenv("WORKER_POLL_INTERVAL", "5"))
+IDLE_TIMEOUT = float(os.getenv("WORKER_IDLE_TIMEOUT", "300"))
+
+
+def run_worker():
+    is_dev = os.getenv("IS_DEV", "false").lower() == "true"
+    logger.info(f"👷 Worker started (poll={POLL_INTERVAL}s, idle timeout={IDLE_TIMEOUT}s)")
+
+    # Workspaces of failed jobs are kept for retries; drop the ones nobody came back for.
+    downloads_dir = os.path.join(OUTPUT_DIR, DOWNLOADS_DIR)
+    sweep_workspaces(downloads_dir)
+
+    jobs_processed = 0
+    idle_since = time.monotonic()
+
+    while True:
+        try:
+            job = fetch_next_job(is_dev)
+        except Exception as e:
+            logger.warning(f"⚠️ Failed to poll for jobs: {e}")
+            job = None
+
+        if job is None:
+            if time.monotonic() - idle_since >= IDLE_TIMEOUT:
+                logger.info(f"💤 No jobs for {IDLE_TIMEOUT:.0f}s. Processed {jobs_processed} job(s), shutting down.")
+                break
+            time.sleep(POLL_INTERVAL)
+            continue
+
+        job_id, payload = job
+        try:
+            ctx = run_job(job_id, payload, is_dev, shutdown_on_error=False)
+            logger.info(f"📬 Job {job_id} finished with status: {ctx.status}")
+        except Exception as e:
+            logger.error(f"❌ Job {job_id} crashed: {e}")
+
+        jobs_processed += 1
+        sweep_workspaces(downloads_dir)
+        idle_since = time.monotonic()
+
+    shutdown_pod()
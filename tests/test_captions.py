@@ -0,0 +1,84 @@
+from modules.youtube.captions import normalize_segments, parse_vtt
+
+# Rolling auto-caption VTT as YouTube serves it: each cue repeats the previous cue's last line,
+# 10 ms hold cues repeat the finished line, and cues are padded with a " " line.
+ROLLING_VTT = """WEBVTT
+Kind: captions
+Language: en
+
+00:00:00.160 --> 00:00:02.070 align:start position:0%
+ 
+hey<00:00:00.480><c> guys</c><00:00:00.799><c> welcome</c><00:00:01.120><c> back</c>
+
+00:00:02.070 --> 00:00:02.080 align:start position:0%
+hey guys welcome back
+ 
+
+00:00:02.080 --> 00:00:04.390 align:start position:0%
+hey guys welcome back
+today<00:00:02.560><c> we're</c><00:00:02.800><c> going</c><00:00:03.040><c> to</c><00:00:03.280><c> play</c>
+
+00:00:04.390 --> 00:00:04.400 align:start position:0%
+today we're going to play
+ 
+
+00:00:04.400 --> 00:00:06.230 align:start position:0%
+today we're going to play
+ranked<00:00:04.880><c> now</c>
+
+00:00:06.230 --> 00:00:06.240 align:start position:0%
+ranked now
+ 
+
+00:00:06.240 --> 00:00:08.000 align:start position:0%
+ranked now
+lets<00:00:06.720><c> go</c>
+"""
+
+
+def _normalize(vtt: str):
+    return list(normalize_segments(parse_vtt([vtt.encode("utf-8")])))
+
+
+def test_parse_vtt_keeps_cues_with_whitespace_lines():
+    segments = list(parse_vtt([ROLLING_VTT.encode("utf-8")]))
+    assert len(segments) == 7
+    assert segments[0]["start"] == 0.16
+    assert segments[0]["text"] == "hey guys welcome back"
+
+
+def test_rolling_vtt_drops_short_repeated_lines():
+    segments = _normalize(ROLLING_VTT)
+    assert " ".join(s["text"] for s in segments) == "hey guys welcome back today we're going to play ranked now lets go"
+    assert segments[0]["start"] == 0.16
+    assert segments[-1]["end"] == 8.0
+
+
+def test_rolling_vtt_two_word_lines():
+    vtt = """WEBVTT
+
+00:00:00.000 --> 00:00:01.000
+ 
+this is
+
+00:00:01.000 --> 00:00:01.010
+this is
+ 
+
+00:00:01.010 --> 00:00:02.000
+this is
+a test
+"""
+    assert " ".join(s["text"] for s in _normalize(vtt)) == "this is a test"
+
+
+def test_short_repeats_across_separate_cues_are_kept():
+    vtt = """WEBVTT
+
+00:00:00.000 --> 00:00:01.000
+no no
+
+00:00:03.000 --> 00:00:04.000
+no no
+"""
+    assert " ".join(s["text"] for s in _normalize(vtt)) == "no no no no"
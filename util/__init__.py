@@ -1,5 +1,6 @@
 from .logger import logger
-from .timer import benchmark, benchmark_results
+from .timer import benchmark, benchmark_results, benchmark_metrics, record_metrics
 from .watchdog import watchdog
-from .webhook import notify
+from .webhook import notify, flush_webhooks
 from .shutdown_pod import shutdown_pod
+from .workspace import remove_workspace, sweep_workspaces
@@ -1,24 +1,170 @@
-from b2sdk.v2 import InMemoryAccountInfo, B2Api
-from pathlib import Path
+import hashlib
+import io
+import mimetypes
 import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+from b2sdk.v2 import InMemoryAccountInfo, B2Api
+from b2sdk.v2.exception import FileNotPresent
+
+from util import http_client
+from util.logger import logger
+
+PUBLIC_URL_BASE = os.getenv("B2_PUBLIC_URL", "https://f005.backblazeb2.com/file")
+# "production", or the URL of another B2-compatible API (e.g. a local fake server for testing).
+B2_REALM = os.getenv("B2_REALM", "production")
+DEFAULT_BUCKET = "viral-rocket-assets"
+UPLOAD_WORKERS = int(os.getenv("B2_UPLOAD_WORKERS", "4"))
+LOCAL_CACHE_MAX_BYTES = int(os.getenv("B2_LOCAL_CACHE_MAX_MB", "256")) * 1024 * 1024
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def public_url(bucket_name: str, b2_filename: str) -> str:
+    return f"{PUBLIC_URL_BASE}/{bucket_name}/{b2_filename}"
+
+
+@dataclass
+class Artifact:
+    key: str
+    path: Optional[str] = None
+    data: Optional[bytes] = None
+    content_type: Optional[str] = None
+
+
+def _sha1_file(path: str) -> str:
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ArtifactStore:
+    def __init__(self, bucket_name: str, api: Optional[B2Api] = None, realm: str = B2_REALM):
+        self.bucket_name = bucket_name
+        self.realm = realm
+        self._api = api
+        self._bucket = None
+        self._lock = threading.Lock()
+        self._cache: "OrderedDict[str, bytes]" = OrderedDict()
+        self._cache_bytes = 0
+        self._local_paths: Dict[str, str] = {}
+
+    def url(self, key: str) -> str:
+        return public_url(self.bucket_name, key)
+
+    def upload(self, artifact: Artifact) -> str:
+        bucket = self._get_bucket()
+        content_type = artifact.content_type or mimetypes.guess_type(artifact.key)[0] or "application/octet-stream"
+
+        if artifact.data is not None:
+            sha1 = hashlib.sha1(artifact.data).hexdigest()
+        else:
+            sha1 = _sha1_file(artifact.path)
+
+        if self._already_uploaded(artifact.key, sha1):
+            logger.info(f"☁️ Skipping upload of {artifact.key}, content unchanged")
+        elif artifact.data is not None:
+            bucket.upload_bytes(artifact.data, file_name=artifact.key, content_type=content_type,
+                                file_info={"src_sha1": sha1})
+        else:
+            # upload_local_file streams from disk and switches to multipart for large files.
+            bucket.upload_local_file(local_file=artifact.path, file_name=artifact.key, content_type=content_type,
+                                     file_info={"src_sha1": sha1}, sha1_sum=sha1)
+
+        self._remember(artifact)
+        return self.url(artifact.key)
+
+    def upload_many(self, artifacts: List[Artifact]) -> List[str]:
+        if len(artifacts) <= 1:
+            return [self.upload(artifact) for artifact in artifacts]
+        with ThreadPoolExecutor(max_workers=min(UPLOAD_WORKERS, len(artifacts))) as pool:
+            return list(pool.map(self.upload, artifacts))
+
+    def read(self, key: str) -> bytes:
+        with self._lock:
+            data = self._cache.get(key)
+            if data is not None:
+                self._cache.move_to_end(key)
+                return data
+            path = self._local_paths.get(key)
+
+        if path and os.path.exists(path):
+            with open(path, "rb") as f:
+                return f.read()
+
+        buffer = io.BytesIO()
+        self._get_bucket().download_file_by_name(key).save(buffer)
+        return buffer.getvalue()
+
+    def read_url(self, url: str) -> bytes:
+        prefix = f"{public_url(self.bucket_name, '')}"
+        if url.startswith(prefix):
+            return self.read(url[len(prefix):])
+
+        response = http_client.get(url)
+        response.raise_for_status()
+        return response.content
+
+    def _get_bucket(self):
+        if self._bucket is not None:
+            return self._bucket
+
+        with self._lock:
+            if self._bucket is None:
+                api = self._api or get_b2_api(self.realm)
+                self._bucket = api.get_bucket_by_name(self.bucket_name)
+        return self._bucket
+
+    def _already_uploaded(self, key: str, sha1: str) -> bool:
+        try:
+            existing = self._get_bucket().get_file_info_by_name(key)
+        except FileNotPresent:
+            return False
+        return sha1 in (existing.content_sha1, (existing.file_info or {}).get("src_sha1"))
+
+    def _remember(self, artifact: Artifact):
+        with self._lock:
+            if artifact.data is None:
+                self._local_paths[artifact.key] = artifact.path
+                return
+
+            if len(artifact.data) > LOCAL_CACHE_MAX_BYTES:
+                return
+            previous = self._cache.pop(artifact.key, None)
+            if previous is not None:
+                self._cache_bytes -= len(previous)
+            self._cache[artifact.key] = artifact.data
+            self._cache_bytes += len(artifact.data)
+            while self._cache_bytes > LOCAL_CACHE_MAX_BYTES:
+                _, evicted = self._cache.popitem(last=False)
+                self._cache_bytes -= len(evicted)
+
 
-def upload_to_b2(local_path: str, b2_filename: str, bucket_name: str):
-    info = InMemoryAccountInfo()
-    b2_api = B2Api(info)
+_apis: Dict[str, B2Api] = {}
+_stores: Dict[str, ArtifactStore] = {}
+_stores_lock = threading.Lock()
 
-    # These should come from your environment or secrets
-    app_key_id = os.getenv("B2_KEY_ID")
-    app_key = os.getenv("B2_APP_KEY")
 
-    b2_api.authorize_account("production", app_key_id, app_key)
+def get_b2_api(realm: str = B2_REALM) -> B2Api:
+    with _stores_lock:
+        api = _apis.get(realm)
+        if api is None:
+            api = B2Api(InMemoryAccountInfo())
+            # These should come from your environment or secrets
+            api.authorize_account(realm, os.getenv("B2_KEY_ID"), os.getenv("B2_APP_KEY"))
+            _apis[realm] = api
+        return api
 
-    bucket = b2_api.get_bucket_by_name(bucket_name)
-    file_path = Path(local_path)
 
-    with file_path.open("rb") as file:
-        file_info = bucket.upload_bytes(
-            file.read(),
-            file_name=b2_filename,
-            content_type="image/png"
-        )
-        return file_info
+def get_artifact_store(bucket_name: str = DEFAULT_BUCKET) -> ArtifactStore:
+    with _stores_lock:
+        store = _stores.get(bucket_name)
+        if store is None:
+            store = _stores[bucket_name] = ArtifactStore(bucket_name)
+        return store
@@ -0,0 +1,96 @@
+import os
+import threading
+import time
+import uuid
+from typing import Dict, Optional
+
+
+class DiskCache:
+    # Flat file cache with LRU eviction by size and an optional TTL. Keys must be filename-safe
+    # (callers use hex digests). Each file starts with its creation timestamp so the TTL survives
+    # the mtime bumps used to track recency.
+
+    def __init__(self, directory: str, max_bytes: int, ttl: Optional[float] = None):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[bytes]:
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                header = f.readline()
+                data = f.read()
+        except FileNotFoundError:
+            return None
+
+        try:
+            created = float(header)
+        except ValueError:
+            self._remove(path)
+            return None
+
+        if self.ttl is not None and time.time() - created > self.ttl:
+            self._remove(path)
+            return None
+
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+        return data
+
+    def put(self, key: str, data: bytes):
+        self._write(key, data)
+        self._evict()
+
+    def put_many(self, items: Dict[str, bytes]):
+        # Writes every entry before a single eviction pass.
+        for key, data in items.items():
+            self._write(key, data)
+        self._evict()
+
+    def _write(self, key: str, data: bytes):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(f"{time.time()}\n".encode("ascii"))
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], key)
+
+    def _remove(self, path: str):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def _evict(self):
+        with self._lock:
+            entries = []
+            total = 0
+            for root, _, files in os.walk(self.directory):
+                for name in files:
+                    if name.endswith(".tmp"):
+                        continue
+                    path = os.path.join(root, name)
+                    try:
+                        stat = os.stat(path)
+                    except FileNotFoundError:
+                        continue
+                    entries.append((stat.st_mtime, stat.st_size, path))
+                    total += stat.st_size
+
+            if total <= self.max_bytes:
+                return
+
+            for _, size, path in sorted(entries):
+                self._remove(path)
+                total -= size
+                if total <= self.max_bytes:
+                    break
@@ -1,9 +1,18 @@
 import os
 import json
-import requests
-from typing import cast
+from typing import Optional, Tuple, cast
 
 from pipeline.context import InputPayload
+from util import http_client
+
+# Where worker mode gets jobs: "api" (the next-job endpoint below) or "queue" (JSON files in
+# WORKER_QUEUE_DIR). Defaults to "queue" when IS_DEV is set and "api" otherwise.
+JOB_SOURCE = os.getenv("WORKER_JOB_SOURCE", "").lower()
+NEXT_JOB_ENDPOINT = os.getenv("WORKER_NEXT_JOB_ENDPOINT", "processing/runpod-next-job")
+QUEUE_DIR = os.getenv("WORKER_QUEUE_DIR", os.path.join("mock_inputs", "queue"))
+
+if JOB_SOURCE not in ("", "api", "queue"):
+    raise ValueError(f"WORKER_JOB_SOURCE must be 'api' or 'queue', got '{JOB_SOURCE}'")
 
 
 def fetch_input_payload(job_id: str, is_dev: bool) -> InputPayload:
@@ -25,7 +34,7 @@ def fetch_input_payload(job_id: str, is_dev: bool) -> InputPayload:
     from urllib.parse import urljoin
 
     api_url = urljoin(base_api_url, "processing/runpod-get-payload")
-    response = requests.get(f"{api_url}?job_id={job_id}")
+    response = http_client.get(f"{api_url}?job_id={job_id}")
     response.raise_for_status()
 
     data = response.json()
@@ -35,3 +44,53 @@ def fetch_input_payload(job_id: str, is_dev: bool) -> InputPayload:
         raise ValueError("Missing payload in response")
 
     return cast(InputPayload, payload)
+
+
+def fetch_next_job(is_dev: bool) -> Optional[Tuple[str, InputPayload]]:
+    source = JOB_SOURCE or ("queue" if is_dev else "api")
+    if source == "queue":
+        return _next_queued_job(QUEUE_DIR)
+
+    base_api_url = os.getenv("WEBHOOK_URL")
+    if not base_api_url:
+        raise EnvironmentError("WEBHOOK_URL must be set")
+
+    from urllib.parse import urljoin
+
+    # Server contract: GET <WEBHOOK_URL>/<WORKER_NEXT_JOB_ENDPOINT>?pod_id=<RUNPOD_POD_ID> claims
+    # the next waiting job for this pod and answers 200 {"job_id": ..., "payload": {...}}, or 204
+    # when nothing is waiting. runpod-get-payload can't be used here: it needs a known job_id.
+    api_url = urljoin(base_api_url, NEXT_JOB_ENDPOINT)
+    response = http_client.get(api_url, params={"pod_id": os.getenv("RUNPOD_POD_ID", "")})
+    if response.status_code == 204:
+        return None
+    if response.status_code == 404:
+        raise RuntimeError(f"Job endpoint {api_url} not found; deploy it or set WORKER_JOB_SOURCE=queue")
+    response.raise_for_status()
+
+    data = response.json() or {}
+    job_id = data.get("job_id")
+    payload = data.get("payload")
+
+    if not job_id or not payload:
+        return None
+
+    return job_id, cast(InputPayload, payload)
+
+
+def _next_queued_job(queue_dir: str) -> Optional[Tuple[str, InputPayload]]:
+    # Local stand-in for the job endpoint: each <job_id>.json in the directory is one job, and
+    # claimed files are renamed to .done.
+    if not os.path.isdir(queue_dir):
+        return None
+
+    pending = sorted(name for name in os.listdir(queue_dir) if name.endswith(".json"))
+    if not pending:
+        return None
+
+    job_path = os.path.join(queue_dir, pending[0])
+    with open(job_path, "r") as f:
+        payload = json.load(f)
+    os.replace(job_path, f"{job_path}.done")
+
+    return os.path.splitext(pending[0])[0], cast(InputPayload, payload)
@@ -0,0 +1,10 @@
+def json_default(value):
+    # Objects with a JSON form of their own (e.g. CompactTranscript) expose to_dict(); numpy values
+    # are unwrapped; anything else is stringified as before.
+    to_dict = getattr(value, "to_dict", None)
+    if callable(to_dict):
+        return to_dict()
+    tolist = getattr(value, "tolist", None)
+    if callable(tolist):
+        return tolist()
+    return str(value)
@@ -1,8 +1,13 @@
 import os
-import requests
+
+from util import http_client
+from util.webhook import flush_webhooks
 
 
 def shutdown_pod():
+    # Make sure queued callbacks (especially the final done/error) go out before the pod dies.
+    flush_webhooks()
+
     pod_id = os.getenv("RUNPOD_POD_ID")
     api_key = os.getenv("RUNPOD_API_KEY")
 
@@ -28,7 +33,7 @@ def shutdown_pod():
         }
     }
 
-    response = requests.post(url, json=data, headers=headers)
+    response = http_client.post(url, json=data, headers=headers)
 
     if response.status_code == 200:
         print("🛑 Pod successfully requested termination!")
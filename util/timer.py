@@ -3,6 +3,7 @@ from contextlib import contextmanager
 from util.logger import logger
 
 benchmark_results = {}
+benchmark_metrics = {}
 
 
 @contextmanager
@@ -16,3 +17,8 @@ def benchmark(name: str):
         elapsed = round(end - start, 2)
         benchmark_results[name] = elapsed
         logger.info(f"✅ Finished: {name} in {elapsed:.2f}s")
+
+
+def record_metrics(name: str, **metrics):
+    benchmark_metrics.setdefault(name, {}).update(metrics)
+    logger.info(f"📊 {name}: " + ", ".join(f"{key}={value}" for key, value in metrics.items()))
@@ -1,10 +1,15 @@
+import threading
 import time
+from typing import Optional
 
-from util import shutdown_pod
+from util.shutdown_pod import shutdown_pod
 from util.webhook import notify
 
 
-def watchdog(timeout_seconds: int, ctx):
-    time.sleep(timeout_seconds)
+def watchdog(timeout_seconds: int, ctx, finished: Optional[threading.Event] = None):
+    if finished is None:
+        time.sleep(timeout_seconds)
+    elif finished.wait(timeout_seconds):
+        return
     notify(ctx, ctx.stage, "error", error="Pod timed out")
     shutdown_pod()
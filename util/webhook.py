@@ -1,11 +1,133 @@
-import requests
+import atexit
+import os
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Deque, Dict, Optional
 from urllib.parse import urljoin
 
-from util import shutdown_pod
+from util import http_client
 from util.logger import logger
+from util.webhook_payload import build_encoder
 
+QUEUE_SIZE = int(os.getenv("WEBHOOK_QUEUE_SIZE", "100"))
+MAX_ATTEMPTS = int(os.getenv("WEBHOOK_MAX_ATTEMPTS", "5"))
+FLUSH_TIMEOUT = float(os.getenv("WEBHOOK_FLUSH_TIMEOUT", "30"))
+
+
+@dataclass
+class WebhookEvent:
+    url: str
+    job_id: str
+    stage: str
+    status: str
+    payload: Dict
+
+    @property
+    def coalescable(self) -> bool:
+        return self.status == "progress"
+
+
+class WebhookDispatcher:
+    def __init__(self, maxsize: int = QUEUE_SIZE):
+        self.maxsize = maxsize
+        self._queue: Deque[WebhookEvent] = deque()
+        self._cond = threading.Condition()
+        self._in_flight = False
+        self._thread: Optional[threading.Thread] = None
+        self._encoder = build_encoder()
+
+    def submit(self, event: WebhookEvent):
+        with self._cond:
+            if event.coalescable and self._coalesce(event):
+                return
+
+            while len(self._queue) >= self.maxsize:
+                if not self._drop_oldest_progress():
+                    self._cond.wait()
+
+            self._queue.append(event)
+            self._ensure_worker()
+            self._cond.notify_all()
+
+    def flush(self, timeout: Optional[float] = FLUSH_TIMEOUT) -> bool:
+        with self._cond:
+            return self._cond.wait_for(lambda: not self._queue and not self._in_flight, timeout)
+
+    def _coalesce(self, event: WebhookEvent) -> bool:
+        # A newer progress update supersedes the queued one. It only takes the old one's place
+        # when nothing else for the job is queued behind it; otherwise the old one is dropped and
+        # the new one goes to the back, so a job's events never arrive out of order.
+        positions = [i for i, queued in enumerate(self._queue) if queued.job_id == event.job_id]
+        progress = [i for i in positions if self._queue[i].coalescable]
+        if not progress:
+            return False
+        if progress[-1] == positions[-1]:
+            self._queue[progress[-1]] = event
+            return True
+        del self._queue[progress[-1]]
+        return False
+
+    def _drop_oldest_progress(self) -> bool:
+        for i, queued in enumerate(self._queue):
+            if queued.coalescable:
+                del self._queue[i]
+                return True
+        return False
+
+    def _ensure_worker(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="webhook-dispatcher", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._queue)
+                event = self._queue.popleft()
+                self._in_flight = True
+                self._cond.notify_all()
+
+            try:
+                self._deliver(event)
+            except Exception as e:
+                logger.error(f"❌ Webhook {event.stage}:{event.status} could not be sent: {e}")
+            finally:
+                with self._cond:
+                    self._in_flight = False
+                    self._cond.notify_all()
+
+    def _deliver(self, event: WebhookEvent):
+        body, headers, ack = self._encoder.encode(event)
+        for attempt in range(MAX_ATTEMPTS):
+            try:
+                res = http_client.post(event.url, data=body, headers=headers)
+                res.raise_for_status()
+                ack()
+                logger.info(f"📡 Webhook sent: {event.stage}:{event.status}")
+                return
+            except Exception as e:
+                if attempt + 1 == MAX_ATTEMPTS:
+                    logger.error(f"❌ Webhook {event.stage}:{event.status} dropped after {MAX_ATTEMPTS} attempts: {e}")
+                    return
+                wait_time = min(2 ** attempt, 10)
+                logger.warning(f"⚠️ Webhook failed: {e}. Retrying in {wait_time}s")
+                time.sleep(wait_time)
+
+
+dispatcher = WebhookDispatcher()
+atexit.register(dispatcher.flush)
+
+
+def flush_webhooks(timeout: Optional[float] = FLUSH_TIMEOUT) -> bool:
+    return dispatcher.flush(timeout)
+
+
+def notify(ctx, stage: str, status: str, error: str = None, progress: float = None):
+    if ctx.cancelled.is_set():
+        return
 
-def notify(ctx, stage: str, status: str, error: str = None):
     if ctx.is_dev:
         logger.info(f"[DEV] Skipped webhook for {stage}:{status}")
         return
@@ -17,28 +139,30 @@ def notify(ctx, stage: str, status: str, error: str = None):
 
     url = urljoin(base_url, "processing/runpod-callback")
 
+    # Steps may run concurrently, so serialize from a consistent snapshot of the output.
+    with ctx.lock:
+        output = dict(ctx.output)
+        video_metadata = output.get("video_metadata")
+        if video_metadata is not None:
+            video_metadata = dict(video_metadata)
+
     payload = {
         "job_id": ctx.job_id,
         "stage": stage,
         "status": status,
         "error": error,
+        "progress": progress,
         "payload": {
-            "video": ctx.output.get("video_metadata"),
+            "video": video_metadata,
             "launch": {
-                "title": ctx.output.get("title"),
-                "description": ctx.output.get("description"),
-                "chapters": ctx.output.get("chapters"),
-                "summary": ctx.output.get("summary"),
-                "thumbnailUrl": ctx.output.get("thumbnail_url"),
-                "thumbnailUrlRaw": ctx.output.get("thumbnail_url_raw"),
+                "title": output.get("title"),
+                "description": output.get("description"),
+                "chapters": output.get("chapters"),
+                "summary": output.get("summary"),
+                "thumbnailUrl": output.get("thumbnail_url"),
+                "thumbnailUrlRaw": output.get("thumbnail_url_raw"),
             },
         }
     }
 
-    try:
-        res = requests.post(url, json=payload)
-        res.raise_for_status()
-        logger.info(f"📡 Webhook sent: {stage}:{status}")
-    except Exception as e:
-        logger.warning(f"⚠️ Webhook failed: {e}")
-        shutdown_pod()
+    dispatcher.submit(WebhookEvent(url=url, job_id=ctx.job_id, stage=stage, status=status, payload=payload))
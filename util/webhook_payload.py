@@ -0,0 +1,119 @@
+import gzip
+import hashlib
+import json
+import os
+from typing import Callable, Dict, Tuple
+
+from util.logger import logger
+from util.serialize import json_default
+
+PAYLOAD_MODE = os.getenv("WEBHOOK_PAYLOAD_MODE", "full")
+ARTIFACT_BUCKET = os.getenv("WEBHOOK_ARTIFACT_BUCKET", "viral-rocket-assets")
+
+SECTIONS = ("video", "launch")
+
+Encoded = Tuple[bytes, Dict[str, str], Callable[[], None]]
+
+
+def _digest(value) -> str:
+    return hashlib.sha1(json.dumps(value, sort_keys=True, default=json_default).encode("utf-8")).hexdigest()
+
+
+def _is_terminal(event) -> bool:
+    return event.stage == "done" or event.status == "error"
+
+
+class FullPayloadEncoder:
+    def encode(self, event) -> Encoded:
+        body = json.dumps(event.payload, default=json_default).encode("utf-8")
+        return body, {"Content-Type": "application/json"}, lambda: None
+
+
+class CompactPayloadEncoder:
+    # Sends only the fields that changed since the last acknowledged callback for a job,
+    # gzip-compressed, with the transcript replaced by a reference to an uploaded copy.
+
+    def __init__(self):
+        self._acked: Dict[str, Dict[str, str]] = {}
+        self._transcript_refs: Dict[str, Dict[int, Tuple[Dict, Dict]]] = {}
+
+    def encode(self, event) -> Encoded:
+        job_id = event.job_id
+        acked = self._acked.get(job_id, {})
+        sent: Dict[str, str] = {}
+        sections: Dict[str, Dict] = {}
+
+        for section in SECTIONS:
+            values = dict(event.payload["payload"].get(section) or {})
+            if section == "video" and values.get("transcript"):
+                values["transcript"] = self._transcript_ref(job_id, values["transcript"])
+
+            changed = {}
+            for key, value in values.items():
+                field = f"{section}.{key}"
+                digest = _digest(value)
+                if acked.get(field) != digest:
+                    changed[key] = value
+                    sent[field] = digest
+
+            prefix = f"{section}."
+            for field in acked:
+                if field.startswith(prefix) and field[len(prefix):] not in values:
+                    changed[field[len(prefix):]] = None
+                    sent[field] = None
+
+            sections[section] = changed
+
+        payload = {key: value for key, value in event.payload.items() if key != "payload"}
+        payload["delta"] = True
+        payload["payload"] = sections
+
+        body = gzip.compress(json.dumps(payload, default=json_default).encode("utf-8"))
+        headers = {"Content-Type": "application/json", "Content-Encoding": "gzip"}
+
+        def ack():
+            if _is_terminal(event):
+                self._acked.pop(job_id, None)
+                self._transcript_refs.pop(job_id, None)
+                return
+            state = self._acked.setdefault(job_id, {})
+            for field, digest in sent.items():
+                if digest is None:
+                    state.pop(field, None)
+                else:
+                    state[field] = digest
+
+        return body, headers, ack
+
+    def _transcript_ref(self, job_id: str, transcript: Dict) -> Dict:
+        # Transcripts are assigned once and never mutated, so the object identity is a cheap cache key.
+        refs = self._transcript_refs.setdefault(job_id, {})
+        cached = refs.get(id(transcript))
+        if cached and cached[0] is transcript:
+            return cached[1]
+
+        data = json.dumps(transcript, default=json_default).encode("utf-8")
+        sha256 = hashlib.sha256(data).hexdigest()
+        b2_key = f"transcripts/{sha256}.json"
+
+        try:
+            from util.b2 import Artifact, get_artifact_store
+            url = get_artifact_store(ARTIFACT_BUCKET).upload(
+                Artifact(key=b2_key, data=data, content_type="application/json"))
+        except Exception as e:
+            logger.warning(f"⚠️ Failed to upload transcript for webhook, sending inline: {e}")
+            return transcript
+
+        ref = {
+            "url": url,
+            "sha256": sha256,
+            "source": transcript.get("source"),
+            "duration": transcript.get("duration"),
+            "segment_count": len(transcript.get("segments") or []),
+        }
+        refs[id(transcript)] = (transcript, ref)
+        return ref
+
+
+def build_encoder(mode: str = PAYLOAD_MODE):
+    return CompactPayloadEncoder() if mode == "compact" else FullPayloadEncoder()
@@ -0,0 +1,43 @@
+import os
+import shutil
+import time
+
+from util.logger import logger
+
+# Download workspaces of failed jobs are kept so a retry can resume them, but not forever.
+WORKSPACE_MAX_AGE = float(os.getenv("DOWNLOAD_WORKSPACE_MAX_AGE_HOURS", "24")) * 3600
+
+
+def remove_workspace(path: str):
+    shutil.rmtree(path, ignore_errors=True)
+
+
+def sweep_workspaces(directory: str, max_age: float = WORKSPACE_MAX_AGE) -> int:
+    # Removes workspaces nothing has written to for max_age seconds. Age is taken from the newest
+    # file, so a download still growing its .part files is never swept.
+    try:
+        entries = list(os.scandir(directory))
+    except FileNotFoundError:
+        return 0
+
+    cutoff = time.time() - max_age
+    removed = 0
+    for entry in entries:
+        if entry.is_dir(follow_symlinks=False) and _last_modified(entry.path) < cutoff:
+            remove_workspace(entry.path)
+            removed += 1
+
+    if removed:
+        logger.info(f"🧹 Removed {removed} stale download workspace(s) from {directory}")
+    return removed
+
+
+def _last_modified(path: str) -> float:
+    newest = os.path.getmtime(path)
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                newest = max(newest, os.path.getmtime(os.path.join(root, name)))
+            except FileNotFoundError:
+                continue
+    return newest